@@ -2,7 +2,6 @@ define(function (require, exports, module) {
     "use strict";
 
     var Dialogs         = brackets.getModule("widgets/Dialogs"),
-        DocumentManager = brackets.getModule("document/DocumentManager"),
         ExtensionUtils  = brackets.getModule("utils/ExtensionUtils"),
         InlineWidget    = brackets.getModule("editor/InlineWidget").InlineWidget,
         KeyEvent        = brackets.getModule("utils/KeyEvent"),
@@ -11,11 +10,13 @@ define(function (require, exports, module) {
     // Lines height for scrolling
     var SCROLL_LINE_HEIGHT = 40;
     var docsTemplate = require("text!templates/docs.html");
-    var pythonAPI = null;
+    var pythonAPI = null,
+        pyDocuments = null;
 
 
-    function PyDocs(pyAPI) {
+    function PyDocs(pyAPI, pyDocs) {
         pythonAPI = pyAPI;
+        pyDocuments = pyDocs;
         return inlineProvider;
     }
 
@@ -28,13 +29,11 @@ define(function (require, exports, module) {
             word     = hostEditor._codeMirror.findWordAt(cursor),
             line     = hostEditor.document.getRange({line: word.anchor.line, ch: 0}, word.head),
             result   = new $.Deferred(),
-            request  = {
-                source: DocumentManager.getCurrentDocument().getText(), // file contents
-                line:   cursor.line,                                    // line no., starting with 0
-                column: cursor.ch,                                      // column no.
-                path:   hostEditor.document.file._path,                 // file path
-                type:   'docs'                                          // type of query
-            };
+            request  = $.extend({
+                line:   cursor.line,                    // line no., starting with 0
+                column: cursor.ch,                      // column no.
+                type:   'docs'                          // type of query
+            }, pyDocuments.track(hostEditor.document)); // file path and version
         pythonAPI(request)
             .done(function (response) {
                 if (response.docs === null) {
@@ -0,0 +1,70 @@
+/* global define, brackets */
+define(function (require, exports, module) {
+    "use strict";
+
+    var DocumentManager = brackets.getModule("document/DocumentManager");
+
+    var pythonAPI = null,
+        documents = {};     // tracked documents by full path
+
+    /* Keeps Python side copies of open documents in sync with line-range
+     * edits, so that requests don't need to send the whole document.
+     * @constructor
+     */
+    function PyDocuments(pyAPI) {
+        pythonAPI = pyAPI;
+        DocumentManager.on("beforeDocumentDelete.pythonTools", function (event, doc) {
+            untrack(doc);
+        });
+    }
+
+    function untrack(doc) {
+        var path = doc.file.fullPath;
+        if (!documents[path]) return;
+
+        doc.off("change.pythonTools");
+        delete documents[path];
+        pythonAPI({type: "close", path: path});
+    }
+
+    /* Starts tracking document, if it is not tracked yet.
+     * @return {object} request fields, identifying the current document state
+     */
+    PyDocuments.prototype.track = function (doc) {
+        var path  = doc.file.fullPath,
+            state = documents[path];
+
+        if (!state) {
+            state = documents[path] = {version: 0, doc: doc};
+            pythonAPI({
+                type:    "open",
+                path:    path,
+                version: state.version,
+                source:  doc.getText()
+            });
+            doc.on("change.pythonTools", function (event, doc, changeList) {
+                state.version += 1;
+                pythonAPI({
+                    type:    "change",
+                    path:    path,
+                    version: state.version,
+                    changes: changeList.map(function (change) {
+                        return {from: change.from, to: change.to, text: change.text};
+                    })
+                });
+            });
+        }
+        return {path: path, version: state.version};
+    };
+
+    /* Forgets all documents, e.g. when Python shell is restarted.
+     */
+    PyDocuments.prototype.reset = function () {
+        Object.keys(documents).forEach(function (path) {
+            documents[path].doc.off("change.pythonTools");
+        });
+        documents = {};
+    };
+
+    module.exports = PyDocuments;
+});
@@ -7,10 +7,12 @@ define(function (require, exports, module) {
         CommandManager  = brackets.getModule("command/CommandManager"),
         FileUtils       = brackets.getModule("file/FileUtils");
 
-    var pythonAPI = null;
+    var pythonAPI = null,
+        pyDocuments = null;
 
-    function pyGoto(pyAPI) {
+    function pyGoto(pyAPI, pyDocs) {
         pythonAPI = pyAPI;
+        pyDocuments = pyDocs;
     }
 
     pyGoto.prototype.goto = function(hostEditor, cursor) {
@@ -19,13 +21,11 @@ define(function (require, exports, module) {
         }
 
         var result = new $.Deferred();
-        pythonAPI({
+        pythonAPI($.extend({
             "type":   "goto",
-            "path":   hostEditor.document.file.fullPath,
             "line":   cursor.line,
-            "column": cursor.ch,
-            "source": hostEditor.document.getText()
-        }).done(function (response) {
+            "column": cursor.ch
+        }, pyDocuments.track(hostEditor.document))).done(function (response) {
             if (response.success) {
                 var path = FileUtils.convertWindowsPathToUnixPath(response.path);
                 if (isWithinProject(path)) {
@@ -2,13 +2,22 @@ define(function (require, exports, module) {
     "use strict";
 
     var EditorManager   = brackets.getModule("editor/EditorManager"),
-        DocumentManager = brackets.getModule("document/DocumentManager"),
         Mustache        = brackets.getModule("thirdparty/mustache/mustache"),
 
         hintTemplate    = require("text!templates/hint.html"),
         cache           = {},
         pythonAPI       = null,
-        counter         = null;
+        pyDocuments     = null,
+        counter         = null,
+        highlightQuery  = null,     // query of the hints observed
+        highlightObserver = new MutationObserver(function (mutations) {
+            mutations.forEach(function (mutation) {
+                var $target = $(mutation.target),
+                    hint = $target.children('.python-hint')[0];
+                if (hint && $target.hasClass('highlight'))
+                    resolveHint(hint.pyhint, highlightQuery);
+            });
+        });
 
     // helpers
     function _shorten(str, length) {
@@ -22,21 +31,56 @@ define(function (require, exports, module) {
                 first: hint.name.slice(0, -hint.complete.length),
                 last:  hint.complete
             },
-            'docstring': hint.docstring.trim(),
+            'docstring': '',    // fetched by resolveHint
             'description': hint.description,
             'type': hint.type,
-            'help': _shorten(hint.docstring, 500)
+            'help': ''
         }));
         $fhint.data = hint;
+        $fhint[0].pyhint = $fhint;
         return $fhint;
     }
+
+    /* Fetches docstring of a hint, autocompletion leaves them out.
+     */
+    function resolveHint($fhint, query) {
+        var hint = $fhint.data;
+        if (hint.docstring !== undefined) return;
+        hint.docstring = '';    // request only once
+
+        pythonAPI($.extend({}, query, {type: 'resolve', name: hint.name}))
+            .done(function (details) {
+                hint.docstring = details.docstring;
+                $fhint.attr('title', _shorten(details.docstring, 500));
+                $fhint.find('.pyhint-pydoc').text(details.docstring.trim());
+            });
+    }
+
+    /* Resolves hints when they get highlighted in the hint list or hovered.
+     * One observer watches the items of the latest hint list only, it lets
+     * go of the previous list's items, which are gone by then.
+     */
+    function resolveOnHighlight($hintArray, query) {
+        highlightObserver.disconnect();
+        highlightQuery = query;
+        $hintArray.forEach(function ($fhint) {
+            $fhint.on('mouseenter', function () { resolveHint($fhint, query); });
+            if ($fhint.parent().length > 0)
+                highlightObserver.observe($fhint.parent()[0], {
+                    attributes: true,
+                    attributeFilter: ['class']
+                });
+        });
+        if ($hintArray.length > 0) resolveHint($hintArray[0], query);   // selected initially
+    }
     // end helpers
 
     /**
      * @constructor
      */
-    function PyHints(pyAPI) {
+    function PyHints(pyAPI, pyDocs) {
         pythonAPI = pyAPI;
+        pyDocuments = pyDocs;
     }
 
     PyHints.prototype.getHints = function(implicitChar) {
@@ -49,13 +93,11 @@ define(function (require, exports, module) {
 
         var deferred = new $.Deferred(),
             cursor   = cache['cursor'],
-            query    = {
-                source: DocumentManager.getCurrentDocument().getText(), // file contents
-                line:   cursor.line,                                    // line no., starting with 0
-                column: cursor.ch,                                      // column no.
-                path:   editor.document.file._path,                     // file path
-                type:   'autocomplete'                                  // type of query
-            };
+            query    = $.extend({
+                line:   cursor.line,                // line no., starting with 0
+                column: cursor.ch,                  // column no.
+                type:   'autocomplete'              // type of query
+            }, pyDocuments.track(editor.document)); // file path and version
         pythonAPI(query)
             .done(function (hintList) {       // if successfull
                 if (localCounter != counter)
@@ -73,6 +115,10 @@ define(function (require, exports, module) {
                     handleWideResults: false
                 };
                 deferred.resolve(resolve_obj);
+                // hint list is rendered by now, resolve highlighted hints
+                window.setTimeout(function () {
+                    resolveOnHighlight($hintArray, query);
+                }, 0);
             })
             .fail(function (err) {          // if error
                 console.error('Python Hints Error: ' + err);
@@ -106,6 +152,7 @@ define(function (require, exports, module) {
             editor = cache['editor'],
             cursor = cache['cursor'],
             doc    = editor.document;
+        highlightObserver.disconnect();     // the hint list closes
         doc.replaceRange(completion, cursor); // insert hint after cursor
         return false;
     };
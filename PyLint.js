@@ -9,7 +9,7 @@ define(function (require, exports, module) {
 
         preferences = PreferencesManager.getExtensionPrefs(EXTENSION_NAME);
 
-    var pythonDomain, flake8Available = true;
+    var pythonAPI, pyDocuments, flake8Available = true;
 
 
     var WITH_GUTTERS = window.bracketsInspectionGutters;
@@ -26,54 +26,69 @@ define(function (require, exports, module) {
             return Type.WARNING;
     }
 
-    function PyLint(pyDomain) {
-        pythonDomain = pyDomain;
-    }
-
-    PyLint.prototype.scanFileAsync = function(text, fullPath) {
-        if ((!flake8Available) || getCurrentDocument().isDirty) {
-            // flake8 cannot deal with unsaved files. Abort checks if file is unsaved
-            return {
-                aborted: true
-            };
+    function _makeReport(errors, fullPath) {
+        var report = {
+            errors: errors.map(function(error) {
+                return {
+                    pos: {
+                        line: error.row - 1,
+                        ch: error.column - 1
+                    },
+                    message: error.code +': ' + error.text,
+                    type: _getErrorSeverity(error.code)
+                }
+            }),
+            aborted: false
         }
 
-        var result = new $.Deferred();
-        pythonDomain.exec("Flake8",
-                          preferences.get("pathToPython"),
-                          fullPath,
-                          preferences.get("maxLineLength"),
-                          preferences.get("ignoredErrors"))
-            .done(function (data) {
+        if (WITH_GUTTERS) {
+            window.bracketsInspectionGutters.set(
+                'bazitur.python-tools', fullPath, report, true
+            );
+        }
+        return report;
+    }
 
-                var report = {
-                    errors: data.map(function(error) {
-                        return {
-                            pos: {
-                                line: error.row - 1,
-                                ch: error.column - 1
-                            },
-                            message: error.code +': ' + error.text,
-                            type: _getErrorSeverity(error.code)
-                        }
-                    }),
-                    aborted: false
-                }
+    function PyLint(pyAPI, pyDocs) {
+        pythonAPI = pyAPI;
+        pyDocuments = pyDocs;
+    }
 
-                if (WITH_GUTTERS) {
-                    window.bracketsInspectionGutters.set(
-                        'bazitur.python-tools', fullPath, report, true
-                    );
-                }
+    /* Lints inside Python shell, either with parso on the tree parsed for
+     * other requests, or with flake8. Works with unsaved documents too.
+     */
+    function scan(type, text, fullPath) {
+        var result = new $.Deferred(),
+            doc = getCurrentDocument(),
+            query = (doc && doc.file.fullPath === fullPath) ?
+                pyDocuments.track(doc) : {path: fullPath, source: text};
 
-                result.resolve(report);
+        pythonAPI($.extend({
+            type: type,
+            max_line_length: preferences.get("maxLineLength"),
+            ignore: preferences.get("ignoredErrors")
+        }, query))
+            .done(function (data) {
+                result.resolve(_makeReport(data, fullPath));
             })
             .fail(function (error) {
-                flake8Available = false;
+                // Cancelled requests and restarts of the shell don't tell,
+                // that flake8 is missing.
+                if (type === "flake8" && error &&
+                        error.name === "Flake8UnavailableError")
+                    flake8Available = false;
                 result.reject(error);
             });
 
         return result.promise();
+    }
+
+    PyLint.prototype.scanFileAsync = function(text, fullPath) {
+        if (preferences.get("linter") === "parso")
+            return scan("lint", text, fullPath);
+        if (!flake8Available)
+            return {aborted: true};
+        return scan("flake8", text, fullPath);
     };
 
     module.exports = PyLint;
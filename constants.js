@@ -3,6 +3,8 @@ define(function (require, exports, module) {
     module.exports = {
         EXTENSION_NAME: "bazitur.python-tools",
         HOMEPAGE:       "https://github.com/bazitur/brackets-python-tools",
+        // responses larger than this (in bytes) are sent compressed
+        COMPRESSION_THRESHOLD: 256 * 1024,
         ERROR_CODES: ["C901", "E101", "E111", "E112", "E113", "E114",
                       "E115", "E116", "E121", "E122", "E123", "E124",
                       "E125", "E126", "E127", "E128", "E129", "E131",
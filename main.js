@@ -63,18 +63,21 @@ define(function (require, exports, module) {
 
     var SETTINGS_CMD_ID  = EXTENSION_NAME + ".settings";
     
-    var PyHints  = require("PyHints"),
-        PyDocs   = require("PyDocs"),
-        PyLint   = require("PyLint"),
-        PyGoto   = require("PyGoto"),
-        PyStatus = require("PyStatus");
+    var PyHints     = require("PyHints"),
+        PyDocs      = require("PyDocs"),
+        PyDocuments = require("PyDocuments"),
+        PyLint      = require("PyLint"),
+        PyGoto      = require("PyGoto"),
+        PyStatus    = require("PyStatus");
 
     var SCRIPT_FULL_PATH = ExtensionUtils.getModulePath(module, 'pythonfiles/python_utils.py');
     var PYTHON_DIRECTORY = ExtensionUtils.getModulePath(module, 'pythonfiles/');
 
     var pythonDomain = new NodeDomain("python-tools", ExtensionUtils.getModulePath(module, "node/PythonDomain"));
 
-    var status = new PyStatus(handleSettings);
+    var status = new PyStatus(handleSettings),
+        python_documents = new PyDocuments(pythonAPI),
+        warmedUp = false;   // if Python shell has sent "ready" event
 
     preferences.definePreference("pathToPython", "string", "python", {
         description: LocalStrings.PATH_TO_PYTHON_TITLE,
@@ -91,6 +94,25 @@ define(function (require, exports, module) {
             return 70 <= value && value <= 300;
         }
     });
+    preferences.definePreference("workers", "number", 2, {
+        description: LocalStrings.WORKERS_TITLE,
+        validator: function (value) {
+            return 1 <= value && value <= 16;
+        }
+    });
+    preferences.definePreference("maxCompletions", "number", 40, {
+        description: LocalStrings.MAX_COMPLETIONS_TITLE,
+        validator: function (value) {
+            return 1 <= value && value <= 1000;
+        }
+    });
+    preferences.definePreference("linter", "string", "flake8", {
+        description: LocalStrings.LINTER_TITLE,
+        values: ["flake8", "parso"]
+    });
+    preferences.definePreference("preloadModules", "array", [], {
+        description: LocalStrings.PRELOAD_MODULES_TITLE
+    });
     preferences.definePreference("ignoredErrors", "array", [], {
         description: LocalStrings.IGNORED_ERRORS_TITLE,
         validator: function (arr) {
@@ -110,6 +132,8 @@ define(function (require, exports, module) {
             .done(function(data) {
                 if (data.status === "OK")
                     deferred.resolve(data.content);
+                else if (data.status === "CANCELLED")
+                    deferred.reject();  // superseded by a newer request
                 else if (data.status === "ERROR") {
                     console.error(
                         "Non-critical error in Python Domain:\n" +
@@ -117,7 +141,7 @@ define(function (require, exports, module) {
                         data.error.name + ": " +
                         data.error.value
                     );
-                    deferred.reject(data.content);
+                    deferred.reject(data.error);
                 }
             })
             .fail(function(error) {
@@ -185,7 +209,20 @@ define(function (require, exports, module) {
         });
     }
     
+    /* Shows warm up progress, which starts after setup.
+     */
+    pythonDomain.on("shellEvent", function (event, name, content) {
+        if (name === "warm_up" && !warmedUp) {
+            status.update("loading", LocalStrings.SHELL_WARMING_UP +
+                          " (" + content.done + "/" + content.total + ")");
+        } else if (name === "ready") {
+            warmedUp = true;
+            status.update("connected", LocalStrings.SHELL_CONNECTED);
+        }
+    });
+
     function setUpPythonShell () {
+        warmedUp = false;
         status.update("loading", LocalStrings.SHELL_CONNECTING);
         pythonDomain.exec("setSettings", {
             pythonPath: preferences.get("pathToPython"),
@@ -194,13 +231,20 @@ define(function (require, exports, module) {
         }).done(function() {
             pythonDomain.exec("startShell")
                 .done(function() {
+                    python_documents.reset();   // new shell knows no documents
                     pythonAPI({
                         "type": "setup",
                         "settings": {
-                            "is_case_sensitive": preferences.get("isCaseSensitive")
+                            "is_case_sensitive": preferences.get("isCaseSensitive"),
+                            "workers":           preferences.get("workers"),
+                            "max_completions":   preferences.get("maxCompletions"),
+                            "warm_up":           true,
+                            "preload_modules":   preferences.get("preloadModules"),
+                            "compression_threshold": CONSTANTS.COMPRESSION_THRESHOLD
                         }
                     }).done(function (data) {
-                        status.update("connected", LocalStrings.SHELL_CONNECTED);
+                        if (!warmedUp)
+                            status.update("loading", LocalStrings.SHELL_WARMING_UP);
                     }).fail(function(error) {
                         internalError(error);
                     });
@@ -232,10 +276,10 @@ define(function (require, exports, module) {
 
     AppInit.appReady(function () {
         
-        var python_hints = new PyHints(pythonAPI),
-            python_docs  = new PyDocs(pythonAPI),
-            python_lint  = new PyLint(pythonDomain, pathToPython),
-            python_goto  = new PyGoto(pythonAPI).goto;
+        var python_hints = new PyHints(pythonAPI, python_documents),
+            python_docs  = new PyDocs(pythonAPI, python_documents),
+            python_lint  = new PyLint(pythonAPI, python_documents),
+            python_goto  = new PyGoto(pythonAPI, python_documents).goto;
         // NOTICE: EditorManager requires jump to definition provider to be a function.
         // Thus, passing method to EditorManager.
         CodeHintManager.registerHintProvider(python_hints, ["python"], 9);
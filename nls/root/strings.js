@@ -4,10 +4,15 @@ define({
     IS_CASE_SENSITIVE_TITLE:     "Use case sensitive completion",
     MAX_LINE_LENGTH_TITLE:       "Maximum line length in Python files",
     IGNORED_ERRORS_TITLE:        "Array of errors ignored by Python Linter",
+    WORKERS_TITLE:               "Number of Python worker processes",
+    MAX_COMPLETIONS_TITLE:       "Maximum number of completions shown",
+    PRELOAD_MODULES_TITLE:       "Array of heavy modules loaded on Python shell start",
+    LINTER_TITLE:                "Python Linter: \"flake8\" or \"parso\" (built-in)",
     ERROR_TITLE:                 "Python Tools Error",
     ERROR_TEXT:                  "Error text",
     ERROR_NOTICE:                "Python Tools requires python shell and <code>jedi</code> module to work. Make sure you've provided correct path for Python executable and installed <code>jedi</code>. See <a href='{{ HOMEPAGE_REF }}'>Project home</a> for support.",
     SHELL_CONNECTING:           "Connecting to Python shell…",
     SHELL_CONNECTED:            "Connected to Python shell",
+    SHELL_WARMING_UP:           "Python shell is warming up",
     SHELL_ERROR:                "Error in Python shell"
 });
@@ -4,10 +4,15 @@ define({
     IS_CASE_SENSITIVE_TITLE:     "Чувствительность к регистру символов",
     MAX_LINE_LENGTH_TITLE:       "Максимальная длина строки в файлах Python",
     IGNORED_ERRORS_TITLE:        "Массив ошибок, игнорируемых Линтером Python",
+    WORKERS_TITLE:               "Количество рабочих процессов Python",
+    MAX_COMPLETIONS_TITLE:       "Максимальное количество показываемых подсказок",
+    PRELOAD_MODULES_TITLE:       "Массив тяжёлых модулей, загружаемых при запуске оболочки Python",
+    LINTER_TITLE:                "Линтер Python: \"flake8\" или \"parso\" (встроенный)",
     ERROR_TITLE:                 "Ошибка инструментов Python",
     ERROR_TEXT:                  "Текст ошибки",
     ERROR_NOTICE:                "Для нормальной работы инструментов Python требуется работающий Python и модуль <code>jedi</code>. Убедитесь, что в настройках указан правильный путь к интерпретатору Python и установлен модуль <code>jedi</code>. Вы можете найти помощь на <a href='{{ HOMEPAGE_REF }}'>сайте проекта</a>.",
     SHELL_CONNECTING:           "Подключение к оболочке Python…",
     SHELL_CONNECTED:            "Подключён к оболочке Python",
+    SHELL_WARMING_UP:           "Оболочка Python прогревается",
     SHELL_ERROR:                "Ошибка в оболочке Python"
 });
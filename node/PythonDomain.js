@@ -1,8 +1,20 @@
 /* global global, require, exports */
 (function() {
     "use strict";
-    var spawn = require("child_process").spawn;
-    var pythonDirectory;
+    var spawn = require("child_process").spawn,
+        zlib  = require("zlib");
+    var pythonDirectory, _domainManager;
+
+    /* Messages are framed as "<encoding> <length>\n" header, followed by
+     * <length> bytes of payload: JSON, or JSON compressed with zlib.
+     */
+    function frame(data) {
+        var payload = Buffer.from(JSON.stringify(data), "utf8");
+        return Buffer.concat([
+            Buffer.from("json " + payload.length + "\n", "ascii"),
+            payload
+        ]);
+    }
 
     /*
      * @constructor
@@ -11,15 +23,27 @@
         this.pythonPath = pythonPath;
         this.pythonScript = pythonScript;
         this.needsRestart = false;
+        this.lastId = 0;
+        this.callBacks = {};    // pending callbacks by request id
+        this.buffer = Buffer.alloc(0);
     }
 
     PythonShell.prototype.send = function (data, callBack) {
-        this.callBack = callBack;
-        if (!this.process) callBack(true, null);
-        else {
-            this.process.stdin.write(JSON.stringify(data));
-            this.process.stdin.write("\n");
-        }
+        if (!this.process) return callBack(true, null);
+
+        data.id = ++this.lastId;
+        this.callBacks[data.id] = callBack;
+        this.process.stdin.write(frame(data));
+    };
+
+    /* Calls and forgets every pending callback, e.g. when shell has died.
+     */
+    PythonShell.prototype.rejectAll = function (error, data) {
+        var callBacks = this.callBacks;
+        this.callBacks = {};
+        Object.keys(callBacks).forEach(function (id) {
+            callBacks[id](error, data);
+        });
     };
 
     PythonShell.prototype.setSettings = function (settings, callBack) {
@@ -29,16 +53,50 @@
         callBack(null, "");
     };
 
-    PythonShell.prototype.handleData = function (buffer) {
-        var data;
+    PythonShell.prototype.handleData = function (chunk) {
+        // a message may be split across chunks, and a chunk may hold several
+        var header, headerEnd, encoding, length;
+        this.buffer = Buffer.concat([this.buffer, chunk]);
+        while ((headerEnd = this.buffer.indexOf("\n")) !== -1) {
+            header = this.buffer.toString("ascii", 0, headerEnd);
+            if (!/^(json|zlib) \d+$/.test(header)) {
+                // out of sync, the response the pending callbacks wait for
+                // may have been lost, skip to the next line
+                console.error("Malformed header: %s", header);
+                this.buffer = this.buffer.slice(headerEnd + 1);
+                this.rejectAll("Malformed response header", null);
+                continue;
+            }
+            header = header.split(" ");
+            encoding = header[0];
+            length = parseInt(header[1], 10);
+            if (this.buffer.length < headerEnd + 1 + length) break;
+
+            this.handleMessage(encoding,
+                               this.buffer.slice(headerEnd + 1, headerEnd + 1 + length));
+            this.buffer = this.buffer.slice(headerEnd + 1 + length);
+        }
+    };
+
+    PythonShell.prototype.handleMessage = function (encoding, payload) {
+        var data, callBack;
         try {
-            data = JSON.parse(buffer.toString());
+            if (encoding === "zlib") payload = zlib.inflateSync(payload);
+            data = JSON.parse(payload.toString("utf8"));
         } catch (error) {
-            data = null;
-            var err = error;
+            console.error("Malformed response: %s", error);
+            return;
         }
-        if (this.callBack) {
-            data !== null? this.callBack(null, data) : this.callBack(err, null);
+        if (data.event) {
+            // not a response, e.g. warm up progress
+            _domainManager.emitEvent("python-tools", "shellEvent",
+                                     [data.event, data.content]);
+            return;
+        }
+        callBack = this.callBacks[data.id];
+        if (callBack) {
+            delete this.callBacks[data.id];
+            callBack(null, data);
         } else {
             console.error("Unhandled data");
         }
@@ -49,8 +107,8 @@
         // should not restart the process there, may continue infinitely
         this.needsRestart = true;
 
-        if (this.callBack) {
-            this.callBack(error, null);
+        if (Object.keys(this.callBacks).length > 0) {
+            this.rejectAll(error, null);
         } else {
             console.error("Unhandled error: %s", error);
         }
@@ -58,19 +116,18 @@
 
     PythonShell.prototype.handleClose = function (code) {
         this.needsRestart = true;
-        if (this.callBack) {
-            if (code === 0)
-                this.callBack(null, true);
-            else
-                this.callBack(null, code);
-        }
+        this.rejectAll("Python shell exited with code " + code, null);
     };
 
     PythonShell.prototype.start = function (callBack) {
         if (this.process) {
+            // old process should not reject callbacks of the new one
+            this.process.removeAllListeners("close");
             this.process.kill();
             this.needsRestart = false;
         }
+        this.rejectAll("Python shell restarted", null);
+        this.buffer = Buffer.alloc(0);
 
         this.process = spawn(this.pythonPath, ["-u", this.pythonScript], {
             windowsHide: true,
@@ -84,57 +141,25 @@
         this.process.on("close", this.handleClose.bind(this));
 
         // resolve in 500 milliseconds if no errors had occured
-        this.callBack = callBack;
         global.setTimeout(function () { callBack(null, true) }, 500);
     };
 
     var pyShell = new PythonShell(null, null);
 
-    function cmdFlake8(pyPath, fileName, lineLength, ignoredErrors, callBack) {
-        var result = [], stderr = '';
-
-        var args = ['-m', 'flake8', '--exit-zero',
-                    '--max-line-length=' + lineLength.toString(),
-                    '--format=%(row)d||%(col)d||%(code)s||%(text)s'];
-
-        if (ignoredErrors.length > 0)
-            args.push('--ignore='+ignoredErrors.join(','));
-        args.push(fileName);
-
-        var flake8 = spawn(pyPath, args, {
-            windowsHide: true,
-            cwd: pythonDirectory
-        });
-
-        flake8.stdout.on('data', function (data) {
-            data = data.toString();
-            data.split("\n").forEach(function (line) {
-                if (line && line.trim()) {
-                    line = line.split("||");
-                    result.push({
-                        row:    line[0],
-                        column: line[1],
-                        code:   line[2],
-                        text:   line[3]
-                    });
-                }
-            });
-        });
-
-        flake8.stderr.on('data', function (data) {
-            stderr = data.toString();
-        });
-
-        flake8.on('close', function (code) {
-            if (code === 0) callBack(null, result);
-            else callBack(stderr, null);
-        });
-    }
-
     function init(domainManager) {
         if (!domainManager.hasDomain("python-tools")) {
             domainManager.registerDomain("python-tools", {major: 0, minor: 1});
         }
+        _domainManager = domainManager;
+        domainManager.registerEvent("python-tools", "shellEvent", [{
+            name: "event",
+            type: "string",
+            description: "event name: \"warm_up\", \"ready\" or \"usages\""
+        }, {
+            name: "content",
+            type: "object",
+            description: "event details"
+        }]);
 
         [{
             name: "startShell",
@@ -145,9 +170,6 @@
         }, {
             name: "setSettings",
             func: pyShell.setSettings.bind(pyShell)
-        }, {
-            name: "Flake8",
-            func: cmdFlake8
         }].forEach(function (item) {
             domainManager.registerCommand(
                 "python-tools",
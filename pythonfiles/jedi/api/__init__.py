@@ -79,10 +79,14 @@ class Script(object):
     :type encoding: str
     :param sys_path: ``sys.path`` to use during analysis of the script
     :type sys_path: list
+    :param evaluator: An evaluator of a previous script that should be reused.
+        Imported modules and inference results are shared then, the caller is
+        responsible for calling :meth:`Evaluator.forget_modules` on changes.
+    :type evaluator: :class:`jedi.evaluate.Evaluator`
 
     """
     def __init__(self, source=None, line=None, column=None, path=None,
-                 encoding='utf-8', sys_path=None):
+                 encoding='utf-8', sys_path=None, evaluator=None):
         self._orig_path = path
         # An empty path (also empty string) should always result in no path.
         self.path = os.path.abspath(path) if path else None
@@ -109,10 +113,16 @@ class Script(object):
         cache.clear_time_caches()
         debug.reset_time()
 
-        # Load the Python grammar of the current interpreter.
-        self._grammar = parso.load_grammar()
-        project = Project(sys_path=sys_path)
-        self._evaluator = Evaluator(self._grammar, project)
+        if evaluator is None:
+            # Load the Python grammar of the current interpreter.
+            self._grammar = parso.load_grammar()
+            project = Project(sys_path=sys_path)
+            self._evaluator = Evaluator(self._grammar, project)
+        else:
+            self._grammar = evaluator.grammar
+            project = evaluator.project
+            self._evaluator = evaluator
+            evaluator.reset_request_state()
         project.add_script_path(self.path)
         debug.speed('init')
 
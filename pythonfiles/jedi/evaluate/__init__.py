@@ -69,7 +69,7 @@ import parso
 
 from jedi import debug
 from jedi import parser_utils
-from jedi.evaluate.utils import unite
+from jedi.evaluate.utils import unite, Cancelled
 from jedi.evaluate import imports
 from jedi.evaluate import recursion
 from jedi.evaluate.cache import evaluator_function_cache
@@ -100,6 +100,7 @@ class Evaluator(object):
         self.is_analysis = False
         self.python_version = sys.version_info[:2]
         self.project = project
+        self.is_cancelled = None  # callback to interrupt evaluation
         project.add_evaluator(self)
 
         self.reset_recursion_limitations()
@@ -111,7 +112,80 @@ class Evaluator(object):
         self.recursion_detector = recursion.RecursionDetector()
         self.execution_recursion_detector = recursion.ExecutionRecursionDetector(self)
 
+    def check_cancelled(self):
+        """
+        A cooperative cancellation point, raises ``Cancelled`` if the current
+        request was cancelled.
+        """
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise Cancelled
+
+    def reset_request_state(self):
+        """
+        Resets the state that is only valid for a single API call. Needed if
+        an evaluator is reused across multiple scripts.
+        """
+        self.inferred_element_counts = {}
+        self.analysis = []
+        self.dynamic_params_depth = 0
+        self.reset_recursion_limitations()
+
+    def forget_modules(self, module_nodes):
+        """
+        Removes the modules of ``module_nodes`` from the module cache, together
+        with every memoized inference result that belongs to them. This is
+        what keeps a long-lived evaluator correct after files have changed.
+        """
+        module_nodes = set(module_nodes)
+        if not module_nodes:
+            return
+
+        roots = {}
+
+        def is_stale(obj):
+            try:
+                return roots[id(obj)]
+            except KeyError:
+                pass
+            if isinstance(obj, type):
+                # Classes are keys of cached class instantiations.
+                return False
+            try:
+                root = obj.get_root_node()
+            except AttributeError:
+                try:
+                    root = obj.get_root_context().tree_node
+                except AttributeError:
+                    root = None
+            roots[id(obj)] = stale = root in module_nodes
+            return stale
+
+        def iter_objects(key, value):
+            obj, args, kwargs = key
+            yield obj
+            for arg in args + tuple(v for k, v in kwargs):
+                if isinstance(arg, (tuple, list)):
+                    for a in arg:
+                        yield a
+                else:
+                    yield arg
+            if isinstance(value, (ContextSet, tuple, list)):
+                for v in value:
+                    yield v
+            else:
+                yield value
+
+        for name, module in list(self.modules.items()):
+            if getattr(module, 'tree_node', None) in module_nodes:
+                del self.modules[name]
+
+        for memo in self.memoize_cache.values():
+            for key, value in list(memo.items()):
+                if any(is_stale(o) for o in iter_objects(key, value)):
+                    del memo[key]
+
     def eval_element(self, context, element):
+        self.check_cancelled()
         if isinstance(context, CompForContext):
             return eval_node(context, element)
 
@@ -37,7 +37,13 @@ def _memoize_default(default=_NO_DEFAULT, evaluator_is_first_arg=False, second_a
             else:
                 if default is not _NO_DEFAULT:
                     memo[key] = default
-                rv = function(obj, *args, **kwargs)
+                try:
+                    rv = function(obj, *args, **kwargs)
+                except BaseException:
+                    # Don't keep the recursion default of an interrupted
+                    # call, e.g. a cancelled one.
+                    memo.pop(key, None)
+                    raise
                 memo[key] = rv
                 return rv
         return wrapper
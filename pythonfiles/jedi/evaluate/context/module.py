@@ -1,4 +1,3 @@
-import pkgutil
 import imp
 import re
 import os
@@ -12,6 +11,7 @@ from jedi.evaluate.filters import GlobalNameFilter, ContextNameMixin, \
 from jedi.evaluate import compiled
 from jedi.evaluate.base_context import TreeContext
 from jedi.evaluate.imports import SubModuleName, infer_import
+from jedi.evaluate.module_index import get_module_index
 
 
 class _ModuleAttributeName(AbstractNameDefinition):
@@ -188,8 +188,8 @@ class ModuleContext(use_metaclass(CachedMetaClass, TreeContext)):
         path = self._path
         names = {}
         if path is not None and path.endswith(os.path.sep + '__init__.py'):
-            mods = pkgutil.iter_modules([os.path.dirname(path)])
-            for module_loader, name, is_pkg in mods:
+            mods = get_module_index().get_module_names([os.path.dirname(path)])
+            for name in mods:
                 # It's obviously a relative import to the current module.
                 names[name] = SubModuleName(self, name)
 
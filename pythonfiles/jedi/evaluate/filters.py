@@ -162,6 +162,7 @@ class AbstractUsedNamesFilter(AbstractFilter):
         self.context = context
 
     def get(self, name):
+        self.context.evaluator.check_cancelled()
         try:
             names = self._used_names[str(name)]
         except KeyError:
@@ -173,6 +174,7 @@ class AbstractUsedNamesFilter(AbstractFilter):
         return [self.name_class(self.context, name) for name in names]
 
     def values(self):
+        self.context.evaluator.check_cancelled()
         return self._convert_names(name for name_list in self._used_names.values()
                                    for name in self._filter(name_list))
 
@@ -0,0 +1,188 @@
+"""
+Index of the identifiers used in Python files of a directory, so that
+dynamic param search and usages only parse the files that contain a name,
+instead of reading every file next to the current module.
+
+For every directory, the identifiers of each ``.py`` file are kept with the
+lines they are used on, together with the modification time and size of the
+file. Files are indexed again, when those change; directories are checked at
+most every ``_CHECK_INTERVAL`` seconds. The index of a directory is pickled
+to the cache directory and can be built in a background thread, e.g. when a
+file of the directory is opened.
+"""
+import os
+import re
+import time
+import threading
+
+from parso import python_bytes_to_unicode
+
+from jedi import debug
+from jedi.evaluate.index_cache import IndexFile, get_cache_path
+
+_INDEX_VERSION = 1
+_CHECK_INTERVAL = 2.0   # seconds
+
+_IDENTIFIER = re.compile(r'[^\W\d]\w*', re.UNICODE)
+
+
+def _index_file(path):
+    """
+    Returns a dict mapping the identifiers of a file to the line numbers they
+    are used on.
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    try:
+        code = python_bytes_to_unicode(source, errors='replace')
+    except LookupError:
+        # Unknown encoding in the coding comment, the file doesn't compile,
+        # but the names in it are still worth finding.
+        code = source.decode('utf-8', 'replace')
+    identifiers = {}
+    for line_nr, line in enumerate(code.splitlines(), 1):
+        for identifier in set(_IDENTIFIER.findall(line)):
+            identifiers.setdefault(identifier, []).append(line_nr)
+    return dict((identifier, tuple(lines))
+                for identifier, lines in identifiers.items())
+
+
+class _DirectoryIndex(object):
+    def __init__(self, files=None):
+        # file name -> (mtime, size, {identifier: line numbers})
+        self.files = files or {}
+        self.names = {}     # identifier -> set of file names
+        for file_name, (_, _, identifiers) in self.files.items():
+            self._add_names(file_name, identifiers)
+        self.checked = 0
+
+    def _add_names(self, file_name, identifiers):
+        for identifier in identifiers:
+            self.names.setdefault(identifier, set()).add(file_name)
+
+    def _remove_names(self, file_name):
+        for identifier in self.files[file_name][2]:
+            file_names = self.names[identifier]
+            file_names.discard(file_name)
+            if not file_names:
+                del self.names[identifier]
+
+    def update(self, directory):
+        """
+        Indexes files, that are new or have changed since, and forgets
+        removed ones. Returns True, if anything has changed.
+        """
+        stats = {}
+        for file_name in os.listdir(directory):
+            if file_name.endswith('.py'):
+                try:
+                    status = os.stat(os.path.join(directory, file_name))
+                except OSError:
+                    continue
+                stats[file_name] = status.st_mtime, status.st_size
+
+        changed = False
+        for file_name in set(self.files) - set(stats):
+            self._remove_names(file_name)
+            del self.files[file_name]
+            changed = True
+        for file_name, (mtime, size) in stats.items():
+            known = self.files.get(file_name)
+            if known is not None and known[:2] == (mtime, size):
+                continue
+            try:
+                identifiers = _index_file(os.path.join(directory, file_name))
+            except (IOError, OSError):
+                continue
+            if known is not None:
+                self._remove_names(file_name)
+            self.files[file_name] = mtime, size, identifiers
+            self._add_names(file_name, identifiers)
+            changed = True
+        return changed
+
+
+class IdentifierIndex(object):
+    def __init__(self, cache_path=None):
+        self._index_file = IndexFile(cache_path, 'identifier', _INDEX_VERSION)
+        self._directories = {}  # directory -> _DirectoryIndex
+        self._lock = threading.Lock()   # guards directories
+        self._update_locks = {}         # directory -> lock
+
+    def get_files(self, directory):
+        """
+        Returns paths of the Python files in a directory.
+        """
+        index = self._get_index(directory)
+        return [os.path.join(directory, file_name) for file_name in index.files]
+
+    def get_files_containing(self, directory, name):
+        """
+        Returns paths of the Python files in a directory, that use the
+        identifier ``name``.
+        """
+        index = self._get_index(directory)
+        return [os.path.join(directory, file_name)
+                for file_name in index.names.get(name, ())]
+
+    def get_lines(self, path, name):
+        """
+        Returns the numbers of the lines, where the identifier ``name`` is
+        used in a file, or an empty tuple if it's not used at all.
+        """
+        directory, file_name = os.path.split(path)
+        index = self._get_index(directory)
+        try:
+            return index.files[file_name][2].get(name, ())
+        except KeyError:
+            return ()
+
+    def index_in_background(self, directory):
+        """
+        Brings the index of a directory up to date in a background thread.
+        """
+        thread = threading.Thread(target=self._get_index, args=(directory,))
+        thread.daemon = True
+        thread.start()
+
+    def _get_index(self, directory):
+        with self._lock:
+            index = self._directories.get(directory)
+            update_lock = self._update_locks.setdefault(
+                directory, threading.Lock())
+        if index is not None and time.time() - index.checked < _CHECK_INTERVAL:
+            return index
+
+        # Only one thread updates a directory, others wait for it.
+        with update_lock:
+            with self._lock:
+                index = self._directories.get(directory)
+            if index is not None and \
+                    time.time() - index.checked < _CHECK_INTERVAL:
+                return index
+            if index is None:
+                index = _DirectoryIndex(self._index_file.load(directory))
+            try:
+                changed = index.update(directory)
+            except OSError:
+                changed = False     # not a directory (anymore)
+            index.checked = time.time()
+            if changed:
+                debug.dbg('identifier index: updated %s', directory)
+                self._index_file.save(index.files, directory)
+            with self._lock:
+                self._directories[directory] = index
+        return index
+
+
+_identifier_index = None
+
+
+def get_identifier_index():
+    """
+    Returns the identifier index of this process.
+    """
+    global _identifier_index
+    if _identifier_index is None:
+        _identifier_index = IdentifierIndex(get_cache_path())
+    return _identifier_index
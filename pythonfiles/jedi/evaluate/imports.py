@@ -13,13 +13,11 @@ statements like ``from datetim`` (curser at the end would return ``datetime``).
 """
 import imp
 import os
-import pkgutil
 import sys
 
 from parso.python import tree
 from parso.tree import search_ancestor
 from parso.cache import parser_cache
-from parso import python_bytes_to_unicode
 
 from jedi._compatibility import find_module, unicode, ImplicitNSInfo
 from jedi import debug
@@ -27,6 +25,8 @@ from jedi import settings
 from jedi.evaluate import sys_path
 from jedi.evaluate import helpers
 from jedi.evaluate import compiled
+from jedi.evaluate.module_index import get_module_index
+from jedi.evaluate.identifier_index import get_identifier_index
 from jedi.evaluate import analysis
 from jedi.evaluate.utils import unite
 from jedi.evaluate.cache import evaluator_method_cache
@@ -134,6 +134,27 @@ def _add_error(context, name, message=None):
         analysis.add(context, 'import-error', name, message)
 
 
+def _find_module(string, path, fullname, is_top_level=False):
+    """
+    Like :func:`jedi._compatibility.find_module`, but looks the module up in
+    the module index first. ``path`` is the sys path for top level modules.
+    """
+    found = get_module_index().find(string, path)
+    if found is not None:
+        module_path, is_pkg = found
+        return None, module_path, is_pkg
+
+    if not is_top_level:
+        return find_module(string, path, fullname=fullname)
+    # Override the sys.path. It works only good that way.
+    # Injecting the path directly into `find_module` did not work.
+    sys.path, temp = path, sys.path
+    try:
+        return find_module(string, fullname=fullname)
+    finally:
+        sys.path = temp
+
+
 def get_init_path(directory_path):
     """
     The __init__ file can be searched in a directory. If found return it, else
@@ -336,7 +357,7 @@ class Importer(object):
                         if not isinstance(path, list):
                             path = [path]
                         module_file, module_path, is_pkg = \
-                            find_module(import_parts[-1], path, fullname=module_name)
+                            _find_module(import_parts[-1], path, module_name)
                         break
                     except ImportError:
                         module_path = None
@@ -347,14 +368,9 @@ class Importer(object):
             parent_module = None
             try:
                 debug.dbg('search_module %s in %s', import_parts[-1], self.file_path)
-                # Override the sys.path. It works only good that way.
-                # Injecting the path directly into `find_module` did not work.
-                sys.path, temp = sys_path, sys.path
-                try:
-                    module_file, module_path, is_pkg = \
-                        find_module(import_parts[-1], fullname=module_name)
-                finally:
-                    sys.path = temp
+                module_file, module_path, is_pkg = \
+                    _find_module(import_parts[-1], sys_path, module_name,
+                                 is_top_level=True)
             except ImportError:
                 # The module is not a package.
                 _add_error(self.module_context, import_path[-1])
@@ -409,7 +425,7 @@ class Importer(object):
 
         if search_path is None:
             search_path = self.sys_path_with_modifications()
-        for module_loader, name, is_pkg in pkgutil.iter_modules(search_path):
+        for name in get_module_index().get_module_names(search_path):
             names.append(self._generate_name(name, in_module=in_module))
         return names
 
@@ -486,6 +502,7 @@ def _load_module(evaluator, path=None, code=None, sys_path=None, parent_module=N
 
         module_node = evaluator.grammar.parse(
             code=code, path=path, cache=True, diff_cache=True,
+            compact=settings.compact_trees,
             cache_path=settings.cache_directory)
 
         from jedi.evaluate.context import ModuleContext
@@ -508,40 +525,40 @@ def get_modules_containing_name(evaluator, modules, name):
     Search a name in the directories of modules.
     """
     from jedi.evaluate.context import ModuleContext
+    index = get_identifier_index()
+
     def check_directories(paths):
         for p in paths:
             if p is not None:
                 # We need abspath, because the seetings paths might not already
                 # have been converted to absolute paths.
                 d = os.path.dirname(os.path.abspath(p))
-                for file_name in os.listdir(d):
-                    path = os.path.join(d, file_name)
-                    if file_name.endswith('.py'):
-                        yield path
+                for path in index.get_files_containing(d, name):
+                    yield path
 
     def check_python_file(path):
         try:
             # TODO I don't think we should use the cache here?!
             node_cache_item = parser_cache[evaluator.grammar._hashed][path]
         except KeyError:
-            try:
-                return check_fs(path)
-            except IOError:
-                return None
+            return check_fs(path)
         else:
             module_node = node_cache_item.node
             return ModuleContext(evaluator, module_node, path=path)
 
     def check_fs(path):
-        with open(path, 'rb') as f:
-            code = python_bytes_to_unicode(f.read(), errors='replace')
-            if name in code:
-                module = _load_module(evaluator, path, code)
-
-                module_name = sys_path.dotted_path_in_sys_path(evaluator.project.sys_path, path)
-                if module_name is not None:
-                    add_module(evaluator, module_name, module)
-                return module
+        # Additional dynamic modules aren't in the directories checked.
+        if not index.get_lines(path, name):
+            return None
+        try:
+            module = _load_module(evaluator, path)
+        except IOError:
+            return None
+
+        module_name = sys_path.dotted_path_in_sys_path(evaluator.project.sys_path, path)
+        if module_name is not None:
+            add_module(evaluator, module_name, module)
+        return module
 
     # skip non python modules
     used_mod_paths = set()
@@ -0,0 +1,98 @@
+"""
+Persistence of the indexes of modules, identifiers and symbols: each index
+is pickled to the cache directory together with its version, so that other
+processes and later sessions start with it. Indexes of a directory are kept
+in a directory of their kind, in a file named by the hash of the directory.
+
+Files are written to a temporary file first, which replaces the old one
+atomically, so that a reader never sees a file half written.
+"""
+import os
+import sys
+import hashlib
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from jedi import settings
+from jedi import debug
+
+
+def get_cache_path():
+    """
+    Returns the directory indexes are saved in, or None if
+    ``settings.use_filesystem_cache`` is not set.
+    """
+    if settings.use_filesystem_cache:
+        return settings.cache_directory
+    return None
+
+
+def _replace(source, destination):
+    try:
+        os.replace(source, destination)
+    except AttributeError:
+        # Python 2 has no os.replace
+        if os.name == 'nt' and os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
+
+
+class IndexFile(object):
+    """
+    Pickled index of a ``kind``, e.g. "module", saved in ``cache_path``.
+    Nothing is saved, if that is None.
+    """
+    def __init__(self, cache_path, kind, version):
+        self._cache_path = cache_path
+        self._kind = kind
+        self._version = version
+
+    def _get_path(self, directory):
+        version = '%s%s' % sys.version_info[:2]
+        if directory is None:
+            return os.path.join(self._cache_path, '%s-index-%s.pkl'
+                                % (self._kind, version))
+        if isinstance(directory, bytes):
+            encoded = directory
+        else:
+            encoded = directory.encode('utf-8', 'replace')
+        return os.path.join(
+            self._cache_path, '%s-index-%s' % (self._kind, version),
+            hashlib.sha1(encoded).hexdigest() + '.pkl')
+
+    def load(self, directory=None):
+        """
+        Returns the index saved for a directory, or None if there is none.
+        """
+        if self._cache_path is None:
+            return None
+        try:
+            with open(self._get_path(directory), 'rb') as f:
+                version, saved_directory, index = pickle.load(f)
+        except Exception:
+            return None     # not there yet or broken, it's built again
+        if version != self._version or saved_directory != directory:
+            return None
+        return index
+
+    def save(self, index, directory=None):
+        if self._cache_path is None:
+            return
+        path = self._get_path(directory)
+        temp_path = '%s.%s.%s.tmp' % (path, os.getpid(),
+                                      threading.current_thread().ident)
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(temp_path, 'wb') as f:
+                pickle.dump((self._version, directory, index), f, 2)
+            _replace(temp_path, path)
+        except (IOError, OSError) as e:
+            debug.warning('Cannot save %s index: %s', self._kind, e)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
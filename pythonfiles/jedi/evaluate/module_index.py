@@ -0,0 +1,219 @@
+"""
+Index of the modules and packages in directories of a sys path, so that
+imports are resolved with a dict lookup instead of asking the file system for
+every import. On network file systems that is the slowest part of resolving
+imports.
+
+Directory listings are saved in the cache directory and shared between
+processes. A listing is used as long as the modification time of its
+directory doesn't change; the time is checked at most every
+``_CHECK_INTERVAL`` seconds. Missing directories, common in sys paths, and
+packages found in a listing are trusted for as long.
+
+Only regular modules, packages and extension modules are indexed. Anything
+else (zip files, namespace packages, builtins, ...) is left to
+:func:`jedi._compatibility.find_module`.
+
+The same listings give names for completion of imports.
+"""
+import os
+import sys
+import imp
+import pkgutil
+import time
+import errno
+import stat
+
+from jedi import debug
+from jedi.evaluate.index_cache import IndexFile, get_cache_path
+
+_INDEX_VERSION = 2
+_CHECK_INTERVAL = 2.0   # seconds
+
+_PACKAGE = 'package'
+_EXTENSION = 'extension'
+_MODULE = 'module'
+_DIRECTORY = 'directory'    # might be a namespace package
+# Same precedence as importlib's FileFinder: packages, extensions, sources.
+_PRECEDENCE = {_PACKAGE: 0, _EXTENSION: 1, _MODULE: 2, _DIRECTORY: 3}
+
+
+def _get_suffixes():
+    extensions = [suffix for suffix, _, type_ in imp.get_suffixes()
+                  if type_ == imp.C_EXTENSION]
+    # Longest first, '.cpython-36m-x86_64-linux-gnu.so' before '.so'.
+    extensions.sort(key=len, reverse=True)
+    return extensions, [suffix for suffix, _, _ in imp.get_suffixes()]
+
+
+_extension_suffixes, _all_suffixes = _get_suffixes()
+
+
+def _is_package(path):
+    return any(os.path.exists(os.path.join(path, '__init__' + suffix))
+               for suffix in _all_suffixes)
+
+
+def _list_directory(directory):
+    """
+    Returns a dict of importable names in a directory, mapping them to a
+    ``(kind, file name)`` tuple.
+    """
+    entries = {}
+
+    def add(name, kind, file_name):
+        known = entries.get(name)
+        if known is None or _PRECEDENCE[kind] < _PRECEDENCE[known[0]]:
+            entries[name] = kind, file_name
+
+    for file_name in os.listdir(directory):
+        if '.' not in file_name:
+            path = os.path.join(directory, file_name)
+            if os.path.isdir(path):
+                add(file_name, _PACKAGE if _is_package(path) else _DIRECTORY,
+                    file_name)
+            continue
+        for suffix in _extension_suffixes:
+            if file_name.endswith(suffix):
+                name = file_name[:-len(suffix)]
+                if '.' not in name:
+                    add(name, _EXTENSION, file_name)
+                break
+        else:
+            if file_name.endswith('.py') and file_name.count('.') == 1:
+                add(file_name[:-3], _MODULE, file_name)
+    return entries
+
+
+class ModuleIndex(object):
+    def __init__(self, cache_path=None):
+        self._index_file = IndexFile(cache_path, 'module', _INDEX_VERSION)
+        self._directories = None    # directory -> (mtime, entries)
+        self._checked = {}          # directory -> time of last check
+        self._packages_checked = {}     # package path -> time of last check
+        self._changed = False
+
+    def find(self, name, directories):
+        """
+        Returns a ``(path, is_package)`` tuple of the module, that would be
+        imported by that name from these directories, or None if the index
+        cannot tell.
+        """
+        if self._directories is None:
+            self._load()
+        try:
+            for directory in directories:
+                entries = self._get_entries(directory)
+                if entries is None:
+                    return None     # not indexed
+                kind, file_name = entries.get(name, (None, None))
+                if kind in (_PACKAGE, _EXTENSION, _MODULE):
+                    path = os.path.join(directory, file_name)
+                    if kind == _PACKAGE and not self._check_package(path):
+                        return None     # __init__ removed in the meantime
+                    return path, kind == _PACKAGE
+                elif kind == _DIRECTORY and sys.version_info >= (3, 3):
+                    # Namespace packages are complicated and rare, leave them
+                    # to importlib.
+                    return None
+            return None
+        finally:
+            if self._changed:
+                self._save()
+
+    def get_module_names(self, directories):
+        """
+        Returns names of the modules and packages in these directories, like
+        ``pkgutil.iter_modules`` does.
+        """
+        if self._directories is None:
+            self._load()
+        names = set()
+        try:
+            for directory in directories:
+                entries = self._get_entries(directory)
+                if entries is None:
+                    names.update(name for _, name, _
+                                 in pkgutil.iter_modules([directory]))
+                else:
+                    names.update(name for name, (kind, _) in entries.items()
+                                 if kind != _DIRECTORY and name != '__init__')
+        finally:
+            if self._changed:
+                self._save()
+        return names
+
+    def _check_package(self, path):
+        """
+        Tells, if a directory listed as package still is one. Adding or
+        removing ``__init__.py`` doesn't change the time of its parent
+        directory, so packages are checked on their own, at most every
+        ``_CHECK_INTERVAL`` seconds as well.
+        """
+        now = time.time()
+        if now - self._packages_checked.get(path, 0) < _CHECK_INTERVAL:
+            return True
+        if not _is_package(path):
+            return False
+        self._packages_checked[path] = now
+        return True
+
+    def _get_entries(self, directory):
+        if not directory:
+            return None
+        now = time.time()
+        known = self._directories.get(directory)
+        if known is not None and \
+                now - self._checked.get(directory, 0) < _CHECK_INTERVAL:
+            return known[1]
+
+        try:
+            status = os.stat(directory)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                return None
+            # Happens a lot in sys path, can't import anything. Missing
+            # directories are kept without time, until they appear.
+            self._checked[directory] = now
+            if known is None or known[0] is not None:
+                self._directories[directory] = None, {}
+                self._changed = True
+            return {}
+        if not stat.S_ISDIR(status.st_mode):
+            return None     # zip or egg file
+        self._checked[directory] = now
+        if known is not None and known[0] == status.st_mtime:
+            return known[1]
+
+        try:
+            entries = _list_directory(directory)
+        except OSError:
+            return None
+        debug.dbg('module index: listed %s', directory)
+        self._directories[directory] = status.st_mtime, entries
+        self._changed = True
+        # The listing has just told, which directories are packages.
+        for kind, file_name in entries.values():
+            if kind == _PACKAGE:
+                self._packages_checked[os.path.join(directory, file_name)] = now
+        return entries
+
+    def _load(self):
+        self._directories = self._index_file.load() or {}
+
+    def _save(self):
+        self._changed = False
+        self._index_file.save(self._directories)
+
+
+_module_index = None
+
+
+def get_module_index():
+    """
+    Returns the module index of this process.
+    """
+    global _module_index
+    if _module_index is None:
+        _module_index = ModuleIndex(get_cache_path())
+    return _module_index
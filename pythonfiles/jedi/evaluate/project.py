@@ -7,6 +7,8 @@ from jedi.cache import underscore_memoization
 
 class Project(object):
     def __init__(self, sys_path=None):
+        self._script_path = None
+        self._fixed_sys_path = sys_path is not None
         if sys_path is not None:
             self._sys_path = sys_path
 
@@ -26,6 +28,10 @@ class Project(object):
         self._base_sys_path = base_sys_path
 
     def add_script_path(self, script_path):
+        if script_path != self._script_path and not self._fixed_sys_path:
+            # The additional paths depend on the script, forget them if the
+            # project is reused for another script.
+            self.__dict__.pop('_sys_path', None)
         self._script_path = script_path
 
     def add_evaluator(self, evaluator):
@@ -0,0 +1,309 @@
+"""
+Index of the classes and functions defined in Python files under a project
+root, so that they can be looked up by name without parsing the project.
+
+Definitions are found line by line, like ctags does: ``def`` and ``class``
+statements with the classes and functions they are nested in, told by
+indentation. Lines inside of triple quoted strings are skipped. That's far
+faster than parsing and good enough to jump to a definition.
+
+The index of a project is pickled to the cache directory. The first lookup
+loads it, or builds it, if there is none yet. Lookups are answered right
+away from what is known, while files changed since (by modification time and
+size) are indexed again in a background thread, at most every
+``_CHECK_INTERVAL`` seconds. Only definitions of those files are replaced.
+"""
+import os
+import re
+import time
+import threading
+
+from parso import python_bytes_to_unicode
+
+from jedi import debug
+from jedi.evaluate.index_cache import IndexFile, get_cache_path
+
+_INDEX_VERSION = 1
+_CHECK_INTERVAL = 2.0   # seconds
+
+_DEFINITION = re.compile(r'[ \t]*(?:async[ \t]+)?(def|class)[ \t]+([^\W\d]\w*)',
+                         re.UNICODE)
+_TRIPLE_QUOTES = re.compile(r'"""|\'\'\'')
+_WORD_START = re.compile(r'(?:^|(?<=_))[^\W_]|(?<=[^\W_])[A-Z]', re.UNICODE)
+
+
+def _find_definitions(code):
+    """
+    Returns ``(name, kind, line, column, container)`` tuples of definitions
+    in code. Kind is one of "class", "function" and "method", container is
+    the dotted name of the classes and functions it's defined in.
+    """
+    definitions = []
+    scopes = []     # (indentation, name, kind) of enclosing definitions
+    quote = None    # the triple quotes of a string spanning lines
+    for line_nr, line in enumerate(code.splitlines(), 1):
+        in_string = quote is not None
+        for match in _TRIPLE_QUOTES.finditer(line):
+            if quote is None:
+                quote = match.group()
+            elif quote == match.group():
+                quote = None
+        if in_string:
+            continue
+
+        stripped = line.lstrip()
+        if not stripped or stripped[0] in '#)]}':
+            continue    # doesn't tell where a definition ends
+        indentation = len(line.expandtabs()) - len(stripped.expandtabs())
+        while scopes and scopes[-1][0] >= indentation:
+            scopes.pop()
+
+        match = _DEFINITION.match(line)
+        if match is None:
+            continue
+        keyword, name = match.groups()
+        if keyword == 'class':
+            kind = 'class'
+        elif scopes and scopes[-1][2] == 'class':
+            kind = 'method'
+        else:
+            kind = 'function'
+        container = '.'.join(scope[1] for scope in scopes)
+        definitions.append((name, kind, line_nr, match.start(2), container))
+        scopes.append((indentation, name, kind))
+    return tuple(definitions)
+
+
+def _index_file(path):
+    with open(path, 'rb') as f:
+        source = f.read()
+    try:
+        code = python_bytes_to_unicode(source, errors='replace')
+    except (LookupError, TypeError):
+        # Unknown coding comment or a codec, that doesn't decode to text.
+        code = source.decode('utf-8', 'replace')
+    return _find_definitions(code)
+
+
+def _list_files(root):
+    for directory, dir_names, file_names in os.walk(root):
+        dir_names[:] = [name for name in dir_names
+                        if not name.startswith('.') and name != '__pycache__']
+        for file_name in file_names:
+            if file_name.endswith('.py'):
+                yield os.path.join(directory, file_name)
+
+
+def _by_name(files, paths):
+    """
+    Returns definitions of the files at paths by name.
+    """
+    by_name = {}
+    for path in paths:
+        for name, kind, line, column, container in files[path][2]:
+            by_name.setdefault(name, []).append(
+                (name, kind, path, line, column, container))
+    return by_name
+
+
+class _Definitions(object):
+    """
+    Definitions of a project by name. Lower case names are joined by line
+    breaks, so that they are matched by regular expressions in one go.
+
+    Definitions aren't changed, once they are looked up, changes make new
+    ones instead, that share what hasn't changed.
+    """
+    def __init__(self, by_name, same_names=None):
+        self.by_name = by_name
+        if same_names is not None:
+            self._lower_names = same_names._lower_names
+            self._text = same_names._text
+            return
+        self._lower_names = {}
+        for name in self.by_name:
+            self._lower_names.setdefault(name.lower(), []).append(name)
+        self._text = '\n%s\n' % '\n'.join(self._lower_names)
+
+    @classmethod
+    def from_files(cls, files):
+        by_name = _by_name(files, files)
+        for definitions in by_name.values():
+            definitions.sort()
+        return cls(by_name)
+
+    def replace(self, old_files, new_files, paths):
+        """
+        Returns definitions with those of the files at paths taken from
+        ``new_files`` instead of ``old_files``. Files missing there have been
+        added or removed.
+        """
+        paths = set(paths)
+        removed = _by_name(old_files, paths.intersection(old_files))
+        added = _by_name(new_files, paths.intersection(new_files))
+        by_name = dict(self.by_name)
+        for name in set(removed) | set(added):
+            definitions = [definition for definition in by_name.get(name, ())
+                           if definition[2] not in paths]
+            definitions.extend(added.get(name, ()))
+            if definitions:
+                by_name[name] = sorted(definitions)
+            else:
+                del by_name[name]
+        if len(by_name) == len(self.by_name) and \
+                all(name in self.by_name for name in added):
+            return _Definitions(by_name, same_names=self)
+        return _Definitions(by_name)
+
+    def _match(self, pattern):
+        names = []
+        for lower_name in re.findall(pattern, self._text, re.UNICODE):
+            names.extend(self._lower_names[lower_name])
+        return names
+
+    def find(self, query, limit):
+        """
+        Returns up to ``limit`` best matches of query, see ``SymbolIndex``.
+        """
+        query = query.lower()
+        if not query:
+            return []
+        escaped = re.escape(query)
+        # Each kind of matches ranks below the previous ones, so that a
+        # kind is only looked for, if there are too few matches so far.
+        kinds = [
+            ('\n(%s[^\n]*)' % escaped,
+             lambda name: (name.lower() != query, _is_private(name))),
+            ('\n([^\n]+?%s[^\n]*)' % escaped,
+             lambda name: (_is_private(name),)),
+            # Negated character classes match up to the next character right
+            # away, without backtracking.
+            ('\n(%s[^\n]*)' % ''.join(
+                '[^%s\n]*%s' % (re.escape(c), re.escape(c)) for c in query),
+             lambda name: (not _initials(name).startswith(query),
+                           _is_private(name))),
+        ]
+        found = []
+        seen = set()
+        for pattern, rank in kinds:
+            names = [name for name in self._match(pattern) if name not in seen]
+            seen.update(names)
+            names.sort(key=lambda name: rank(name) + (len(name), name))
+            for name in names:
+                found.extend(self.by_name[name])
+                if len(found) >= limit:
+                    return found[:limit]
+        return found
+
+
+def _is_private(name):
+    return name.startswith('_')
+
+
+def _initials(name):
+    """
+    Returns first letters of words in names like "word_start" or "WordStart"
+    in lower case.
+    """
+    return ''.join(_WORD_START.findall(name)).lower()
+
+
+class _Project(object):
+    def __init__(self, root):
+        self.root = root
+        self.files = None   # path -> (mtime, size, definitions)
+        self.definitions = None
+        self.checked = 0
+        self.updating = False
+        self.lock = threading.Lock()    # guards loading and updating
+
+
+class SymbolIndex(object):
+    def __init__(self, cache_path=None):
+        self._index_file = IndexFile(cache_path, 'symbol', _INDEX_VERSION)
+        self._projects = {}     # root -> _Project
+        self._lock = threading.Lock()
+
+    def find(self, root, query, limit):
+        """
+        Returns up to ``limit`` definitions under the root directory, with
+        names that contain the characters of ``query`` in order, ignoring
+        case. Exact matches come first, then prefixes, substrings, matches
+        of word initials (split by underscores and camel case) and other
+        matches; shorter names first, private ones last. Definitions are
+        ``(name, kind, path, line, column, container)`` tuples, see
+        ``_find_definitions``.
+        """
+        with self._lock:
+            project = self._projects.get(root)
+            if project is None:
+                project = self._projects[root] = _Project(root)
+        with project.lock:
+            if project.files is None:
+                files = self._index_file.load(root)
+                if files is None:
+                    # Nothing to answer from yet.
+                    project.files = {}
+                    project.definitions = _Definitions({})
+                    self._update(project)
+                    project.checked = time.time()
+                else:
+                    project.files = files
+                    project.definitions = _Definitions.from_files(files)
+            if not project.updating and \
+                    time.time() - project.checked >= _CHECK_INTERVAL:
+                project.checked = time.time()
+                project.updating = True
+                thread = threading.Thread(target=self._update_in_background,
+                                          args=(project,))
+                thread.daemon = True
+                thread.start()
+        return project.definitions.find(query, limit)
+
+    def _update_in_background(self, project):
+        try:
+            self._update(project)
+        finally:
+            project.updating = False
+
+    def _update(self, project):
+        files = {}
+        changed = []
+        for path in _list_files(project.root):
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            known = project.files.get(path)
+            if known is not None and \
+                    known[:2] == (status.st_mtime, status.st_size):
+                files[path] = known
+                continue
+            try:
+                definitions = _index_file(path)
+            except (IOError, OSError):
+                continue
+            files[path] = status.st_mtime, status.st_size, definitions
+            changed.append(path)
+        changed.extend(path for path in project.files if path not in files)
+        if changed:
+            debug.dbg('symbol index: updated %s files of %s',
+                      len(changed), project.root)
+            # Lookups meanwhile use the old definitions.
+            project.definitions = project.definitions.replace(
+                project.files, files, changed)
+            project.files = files
+            self._index_file.save(files, project.root)
+
+
+_symbol_index = None
+
+
+def get_symbol_index():
+    """
+    Returns the symbol index of this process.
+    """
+    global _symbol_index
+    if _symbol_index is None:
+        _symbol_index = SymbolIndex(get_cache_path())
+    return _symbol_index
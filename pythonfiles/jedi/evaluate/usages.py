@@ -60,3 +60,23 @@ def usages(module_context, tree_name):
                 for name in new:
                     non_matching_usage_maps.setdefault(name, []).append(new)
     return found_names.values()
+
+
+def find_definitions(module_context, tree_name):
+    """
+    Returns the names, that ``tree_name`` stands for: the name itself and
+    the ones it leads to with goto.
+    """
+    return list(_find_names(module_context, tree_name).values())
+
+
+def find_usages_in_module(module_context, search_name, is_definition):
+    """
+    Returns name leaves of a module, that stand for a name ``is_definition``
+    is true for. Unlike ``usages``, this needs no names of other modules, so
+    that modules can be searched separately, e.g. in other processes.
+    """
+    for name_leaf in module_context.tree_node.get_used_names().get(search_name, []):
+        if any(is_definition(name)
+               for name in find_definitions(module_context, name_leaf)):
+            yield name_leaf
@@ -30,6 +30,13 @@ class UncaughtAttributeError(Exception):
     """
 
 
+class Cancelled(Exception):
+    """
+    Raised at cooperative points of the evaluation, if the evaluator's
+    ``is_cancelled`` callback tells that the result is not needed anymore.
+    """
+
+
 def safe_property(func):
     return property(reraise_uncaught(func))
 
@@ -112,6 +112,13 @@ something has been changed e.g. to a function. If this happens, only the
 function is being reparsed.
 """
 
+compact_trees = False
+"""
+Parse imported modules into compact trees, that share equal strings and have
+no spare room in lists of children. They take less memory, which matters
+with big packages, but parsing takes a bit longer.
+"""
+
 # ----------------
 # dynamic stuff
 # ----------------
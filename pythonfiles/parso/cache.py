@@ -1,12 +1,20 @@
 import time
 import os
 import sys
-import hashlib
 import gc
 import shutil
 import platform
-import errno
 import logging
+import mmap
+import atexit
+import threading
+import uuid
+import hashlib
+from collections import OrderedDict
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 
 try:
     import cPickle as pickle
@@ -18,7 +26,7 @@ from parso._compatibility import FileNotFoundError
 LOG = logging.getLogger(__name__)
 
 
-_PICKLE_VERSION = 30
+_PICKLE_VERSION = 33
 """
 Version number (integer) for file system cache.
 
@@ -31,6 +39,14 @@ are regarded as incompatible.
 - A __slot__ of a class is changed.
 """
 
+_GRAMMAR_TABLES_VERSION = 2
+"""
+Version number (integer) for cached grammar tables.
+
+Increment this number when the tables generated by pgen change for the same
+grammar text, e.g. when the layout of ``pgen2.grammar.Grammar`` changes.
+"""
+
 _VERSION_TAG = '%s-%s%s-%s' % (
     platform.python_implementation(),
     sys.version_info[0],
@@ -64,7 +80,153 @@ On Linux, if environment variable ``$XDG_CACHE_HOME`` is set,
 ``$XDG_CACHE_HOME/parso`` is used instead of the default one.
 """
 
-parser_cache = {}
+content_addressed = False
+"""
+If enabled, pickled modules are found by the hash of their code as well.
+
+Modules are normally looked up by path and only used if the file hasn't been
+modified since they were saved. Switching branches back and forth touches
+files without changing them in the end; with this option a file is hashed if
+its modification time doesn't match and the module is loaded anyway, if a
+module with the same code is cached, under any path. The length of the code
+is checked first, so that files that cannot match are not hashed.
+"""
+
+class _GrammarCache(MutableMapping):
+    """
+    Cached items of a single grammar by path. Keeps
+    :py:class:`_ParserCache` informed about every access, so that it can
+    evict least recently used items.
+    """
+    def __init__(self, parser_cache, hashed_grammar):
+        self._parser_cache = parser_cache
+        self._hashed_grammar = hashed_grammar
+        self._items = {}
+
+    def __getitem__(self, path):
+        try:
+            item = self._items[path]
+        except KeyError:
+            self._parser_cache.misses += 1
+            raise
+        self._parser_cache._touch((self._hashed_grammar, path))
+        return item
+
+    def __setitem__(self, path, item):
+        self._items[path] = item
+        self._parser_cache._add((self._hashed_grammar, path), item)
+
+    def __delitem__(self, path):
+        del self._items[path]
+        self._parser_cache._remove((self._hashed_grammar, path))
+
+    def __contains__(self, path):
+        return path in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class _ParserCache(dict):
+    """
+    Cached module trees, ``{hashed_grammar: {path: _NodeCacheItem}}``.
+
+    Unlimited by default. With :py:meth:`set_limits` least recently used
+    items are evicted once there are too many of them or their code is too
+    long in total, code length being a cheap estimate of the tree size.
+    Items of pinned paths, e.g. open editor buffers, are never evicted.
+    """
+    def __init__(self):
+        super(_ParserCache, self).__init__()
+        self.max_items = None
+        self.max_size = None
+        self.on_evict = None    # called with path and item of evicted items
+        self._order = OrderedDict()     # (grammar, path) -> size, LRU first
+        self._size = 0
+        self._pinned = set()
+        self.hits = self.misses = self.evictions = 0
+
+    def __missing__(self, hashed_grammar):
+        grammar_cache = _GrammarCache(self, hashed_grammar)
+        dict.__setitem__(self, hashed_grammar, grammar_cache)
+        return grammar_cache
+
+    def setdefault(self, hashed_grammar, default=None):
+        return self[hashed_grammar]
+
+    def clear(self):
+        super(_ParserCache, self).clear()
+        self._order.clear()
+        self._size = 0
+
+    def set_limits(self, max_items=None, max_size=None):
+        """
+        Limits number of items and total length of their code in characters.
+        None means no limit.
+        """
+        self.max_items = max_items
+        self.max_size = max_size
+        self._evict()
+
+    def pin(self, path):
+        self._pinned.add(path)
+
+    def unpin(self, path):
+        self._pinned.discard(path)
+        self._evict()
+
+    def stats(self):
+        return {
+            'items': len(self._order),
+            'size': self._size,
+            'pinned': len(self._pinned),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _touch(self, key):
+        self.hits += 1
+        size = self._order.pop(key)
+        self._order[key] = size
+
+    def _add(self, key, item):
+        self._remove(key)
+        size = sum(len(line) for line in item.lines)
+        self._order[key] = size
+        self._size += size
+        self._evict()
+
+    def _remove(self, key):
+        self._size -= self._order.pop(key, 0)
+
+    def _evict(self):
+        def over_limits():
+            return (self.max_items is not None and
+                    len(self._order) > self.max_items) or \
+                (self.max_size is not None and self._size > self.max_size)
+
+        if not over_limits():
+            return
+        # The most recent item is kept, it's being used right now.
+        for key in list(self._order)[:-1]:
+            hashed_grammar, path = key
+            if path in self._pinned:
+                continue
+            grammar_cache = self[hashed_grammar]
+            item = grammar_cache._items.pop(path)
+            self._remove(key)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(path, item)
+            if not over_limits():
+                return
+
+
+parser_cache = _ParserCache()
 
 
 class _NodeCacheItem(object):
@@ -94,31 +256,41 @@ def load_module(hashed_grammar, path, cache_path=None):
 
 
 def _load_from_file_system(hashed_grammar, path, p_time, cache_path=None):
-    cache_path = _get_hashed_path(hashed_grammar, path, cache_path=cache_path)
+    store = _get_module_store(cache_path)
+    module_cache_item = store.load(hashed_grammar, path, p_time)
+    if module_cache_item is None:
+        return None
+    parser_cache[hashed_grammar][path] = module_cache_item
+    LOG.debug('pickle loaded: %s', path)
+    return module_cache_item.node
+
+
+def load_module_by_content(hashed_grammar, path, code, cache_path=None):
+    """
+    Returns a cached module with the same code or None, if there is none or
+    if :py:data:`content_addressed` is disabled. The module is cached under
+    ``path`` afterwards.
+    """
+    if not content_addressed or path is None:
+        return None
     try:
-        try:
-            if p_time > os.path.getmtime(cache_path):
-                # Cache is outdated
-                return None
-        except OSError as e:
-            if e.errno == errno.ENOENT:
-                # In Python 2 instead of an IOError here we get an OSError.
-                raise FileNotFoundError
-            else:
-                raise
-
-        with open(cache_path, 'rb') as f:
-            gc.disable()
-            try:
-                module_cache_item = pickle.load(f)
-            finally:
-                gc.enable()
-    except FileNotFoundError:
+        p_time = os.path.getmtime(path)
+    except OSError:
         return None
-    else:
-        parser_cache.setdefault(hashed_grammar, {})[path] = module_cache_item
-        LOG.debug('pickle loaded: %s', path)
-        return module_cache_item.node
+    store = _get_module_store(cache_path)
+    module_cache_item = store.load_content(hashed_grammar, path, code, p_time)
+    if module_cache_item is None:
+        return None
+    parser_cache[hashed_grammar][path] = module_cache_item
+    LOG.debug('pickle loaded by content: %s', path)
+    return module_cache_item.node
+
+
+def _hash_code(code):
+    try:
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+    except UnicodeError:
+        return None     # lone surrogates, never found by content
 
 
 def save_module(hashed_grammar, path, module, lines, pickling=True, cache_path=None):
@@ -129,28 +301,490 @@ def save_module(hashed_grammar, path, module, lines, pickling=True, cache_path=N
         pickling = False
 
     item = _NodeCacheItem(module, lines, p_time)
-    parser_cache.setdefault(hashed_grammar, {})[path] = item
+    parser_cache[hashed_grammar][path] = item
     if pickling and path is not None:
         _save_to_file_system(hashed_grammar, path, item, cache_path=cache_path)
 
 
 def _save_to_file_system(hashed_grammar, path, item, cache_path=None):
-    with open(_get_hashed_path(hashed_grammar, path, cache_path=cache_path), 'wb') as f:
-        pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+    _get_module_store(cache_path).save(hashed_grammar, path, item)
+
+
+def _replace(source, destination):
+    try:
+        os.replace(source, destination)
+    except AttributeError:
+        # Python 2 has no os.replace
+        if os.name == 'nt' and os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
+
+
+class _ModuleStore(object):
+    """
+    Pickled modules of a cache directory.
+
+    Instead of a file per module, every process appends pickles to its own
+    segment file. Each segment has an index file next to it, mapping
+    ``(hashed_grammar, path)`` to the offset, length and modification time
+    of the pickled module, as well as the length and hash of its code.
+    Indexes of all segments are read once and merged; segments are
+    memory-mapped for reading.
+
+    Saved modules are written by a background thread in batches, so that
+    saving doesn't slow down parsing. Closed segments are garbage collected
+    from time to time: live modules are copied to the current segment,
+    while outdated ones and modules of deleted files are dropped.
+    """
+    _segment_size = 64 * 1024 * 1024  # a new segment is started after that
+    _batch_delay = 0.5                # seconds to collect a batch of writes
+    _refresh_delay = 1.0              # seconds between index rereads
+    _max_segments = 8                 # garbage is collected above that
+    _abandoned_age = 24 * 60 * 60     # unclosed segments of dead processes
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._index = {}    # key -> (segment, offset, length, p_time, size, digest)
+        self._contents = {}     # (hashed_grammar, digest) -> key
+        self._sizes = set()     # (hashed_grammar, size) of indexed code
+        self._loaded = {}   # segment -> mtime of its index when read
+        self._maps = {}     # segment -> mmap
+        self._refreshed = None
+        self._segment = None    # segment written by this process
+        self._segment_entries = {}
+        self._segment_end = 0
+        self._pending = OrderedDict()   # key -> item, not yet written
+        self._lock = threading.Lock()   # guards pending items
+        self._condition = threading.Condition(self._lock)
+        self._index_lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    # Reading
+
+    def load(self, hashed_grammar, path, p_time):
+        """
+        Returns cached item of a module or None, if there is none or if the
+        module has changed since.
+        """
+        key = (hashed_grammar, path)
+        with self._lock:
+            item = self._pending.get(key)
+        if isinstance(item, _NodeCacheItem):
+            return item if p_time <= item.change_time else None
+        if isinstance(item, _PickledItem):
+            change_time, data = item.change_time, item.data
+        else:
+            with self._index_lock:
+                if key not in self._index:
+                    self._refresh()
+                entry = self._index.get(key)
+                if entry is None:
+                    return None
+                change_time = entry[3]
+                data = self._read_entry(key, entry)
+            if data is None:
+                return None
+        if p_time > change_time:
+            return None     # outdated
+        item = self._unpickle(data, path)
+        if item is not None:
+            # Pickles relinked by content keep the time they were made.
+            item.change_time = change_time
+        return item
+
+    def load_content(self, hashed_grammar, path, code, p_time):
+        """
+        Returns cached item of a module with the same code or None. The item
+        is saved for ``path`` with the given modification time, so that it's
+        found by path next time.
+        """
+        size = len(code)
+        with self._index_lock:
+            self._refresh()
+            if (hashed_grammar, size) not in self._sizes:
+                return None
+            digest = _hash_code(code)
+            found = self._contents.get((hashed_grammar, digest))
+            entry = found and self._index.get(found)
+            if entry is None or entry[5] != digest:
+                return None
+            data = self._read_entry(found, entry)
+        if data is None:
+            return None
+        item = self._unpickle(data, path)
+        if item is not None:
+            item.change_time = p_time
+            # The pickle is written again, but it's not pickled again.
+            with self._lock:
+                self._pending.setdefault(
+                    (hashed_grammar, path),
+                    _PickledItem(data, p_time, size, digest))
+            self._start_writing()
+        return item
+
+    def _read_entry(self, key, entry):
+        """
+        Returns pickled data of an index entry. The caller holds the index
+        lock.
+        """
+        segment, offset, length = entry[:3]
+        try:
+            return self._read(segment, offset, length)
+        except (IOError, OSError, ValueError):
+            # collected by another process in the meantime
+            self._index.pop(key, None)
+            return None
+
+    def _unpickle(self, data, path):
+        gc.disable()
+        try:
+            return pickle.loads(data)
+        except Exception:
+            LOG.warning('Cannot load cached module %s', path, exc_info=True)
+            return None
+        finally:
+            gc.enable()
+
+    def _read(self, segment, offset, length):
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < offset + length:
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped[offset:offset + length]
+
+    def _refresh(self, force=False):
+        """
+        Reads indexes, that have changed since last time. The caller holds
+        the index lock.
+        """
+        now = time.time()
+        if not force and self._refreshed is not None and \
+                now - self._refreshed < self._refresh_delay:
+            return
+        self._refreshed = now
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return
+        segments = set(name[:-len('.idx')] for name in names
+                       if name.endswith('.idx'))
+        for segment in set(self._loaded) - segments:
+            self._forget_segment(segment)
+        for segment in segments:
+            index = self._read_index(segment)
+            if index is None:
+                continue
+            mtime, closed, entries = index
+            if self._loaded.get(segment) == mtime:
+                continue
+            self._loaded[segment] = mtime
+            for key, entry in entries.items():
+                known = self._index.get(key)
+                if known is None or known[3] <= entry[2]:
+                    self._add_entry(key, (segment,) + entry)
+
+    def _add_entry(self, key, entry):
+        self._index[key] = entry
+        hashed_grammar = key[0]
+        size, digest = entry[4:]
+        if digest is not None:
+            self._contents[hashed_grammar, digest] = key
+            self._sizes.add((hashed_grammar, size))
+
+    def _read_index(self, segment):
+        path = self._index_path(segment)
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, 'rb') as f:
+                closed, entries = pickle.load(f)
+        except Exception:
+            return None     # just removed or being replaced
+        return mtime, closed, entries
+
+    def _forget_segment(self, segment):
+        self._loaded.pop(segment, None)
+        mapped = self._maps.pop(segment, None)
+        if mapped is not None:
+            mapped.close()
+        for key in [key for key, entry in self._index.items()
+                    if entry[0] == segment]:
+            del self._index[key]
+        # Stale contents and sizes are harmless, they are checked against
+        # the index.
+
+    # Writing
+
+    def save(self, hashed_grammar, path, item):
+        with self._lock:
+            self._pending[(hashed_grammar, path)] = item
+        self._start_writing()
+
+    def _start_writing(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_forever)
+                self._thread.daemon = True
+                self._thread.start()
+                atexit.register(self.close)
+            self._condition.notify()
+
+    def _write_forever(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._condition.wait()
+            time.sleep(self._batch_delay)
+            self.flush()
+            self._collect_garbage()
+
+    def flush(self):
+        """
+        Writes pending items to the segment of this process.
+        """
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, OrderedDict()
+            if not pending:
+                return
+            try:
+                self._write(list(pending.items()))
+            except (IOError, OSError):
+                LOG.warning('Cannot write parser cache', exc_info=True)
+
+    def _write(self, items):
+        if self._segment is None or self._segment_end > self._segment_size:
+            self._start_segment()
+        entries = {}
+        with open(self._segment_path(self._segment), 'ab') as f:
+            for key, item in items:
+                if isinstance(item, _PickledItem):
+                    data, size, digest = item.data, item.size, item.digest
+                else:
+                    try:
+                        data = pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+                    except Exception:
+                        LOG.warning('Cannot pickle %s', key[1], exc_info=True)
+                        continue
+                    code = ''.join(item.lines)
+                    size, digest = len(code), _hash_code(code)
+                f.write(data)
+                entries[key] = (self._segment_end, len(data), item.change_time,
+                                size, digest)
+                self._segment_end += len(data)
+        self._segment_entries.update(entries)
+        self._write_index(closed=False)
+        with self._index_lock:
+            self._loaded[self._segment] = None  # it's known without reading
+            for key, entry in entries.items():
+                self._add_entry(key, (self._segment,) + entry)
+
+    def _write_index(self, closed):
+        path = self._index_path(self._segment)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump((closed, self._segment_entries), f,
+                        pickle.HIGHEST_PROTOCOL)
+        _replace(temp_path, path)
+
+    def _start_segment(self):
+        if self._segment is not None:
+            self._write_index(closed=True)
+        self._segment = 'modules-%s' % uuid.uuid4().hex
+        self._segment_entries = {}
+        self._segment_end = 0
+
+    def close(self):
+        """
+        Writes everything pending and closes the segment of this process,
+        so that other processes may collect it, and mapped segments.
+        """
+        self.flush()
+        with self._write_lock:
+            if self._segment is not None:
+                try:
+                    self._write_index(closed=True)
+                except (IOError, OSError):
+                    pass
+                self._segment = None
+        with self._index_lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    # Garbage collection
+
+    def _collect_garbage(self):
+        """
+        Copies live modules of closed segments to the current segment and
+        removes the closed segments, if there are too many segments. Only
+        one process collects at a time.
+        """
+        with self._index_lock:
+            self._refresh(force=True)
+            if len(self._loaded) <= self._max_segments:
+                return
+        lock_path = os.path.join(self._directory, 'modules.lock')
+        try:
+            if time.time() - os.path.getmtime(lock_path) > 60 * 60:
+                os.remove(lock_path)    # left by a crashed process
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL))
+        except OSError:
+            return
+        try:
+            self._collect_closed_segments()
+        except (IOError, OSError):
+            LOG.warning('Cannot collect parser cache', exc_info=True)
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _collect_closed_segments(self):
+        now = time.time()
+        with self._index_lock:
+            collected = []
+            for segment in list(self._loaded):
+                if segment == self._segment:
+                    continue
+                index = self._read_index(segment)
+                if index is None:
+                    continue
+                mtime, closed, entries = index
+                if closed or now - mtime > self._abandoned_age:
+                    collected.append(segment)
+            entries = [(key, entry) for key, entry in self._index.items()
+                       if entry[0] in collected]
+
+        live = {}
+        for key, (segment, offset, length, p_time, size, digest) in entries:
+            try:
+                if os.path.getmtime(key[1]) > p_time:
+                    continue    # outdated
+            except OSError:
+                continue        # deleted
+            with self._index_lock:
+                data = self._read(segment, offset, length)
+            live[key] = _PickledItem(data, p_time, size, digest)
+        with self._lock:
+            for key, item in live.items():
+                self._pending.setdefault(key, item)
+        self.flush()
+
+        with self._index_lock:
+            for segment in collected:
+                self._forget_segment(segment)
+                for path in (self._index_path(segment),
+                             self._segment_path(segment)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass    # Windows keeps files mapped elsewhere
+        LOG.debug('parser cache collected, %s modules kept', len(live))
+
+    def _segment_path(self, segment):
+        return os.path.join(self._directory, segment + '.seg')
+
+    def _index_path(self, segment):
+        return os.path.join(self._directory, segment + '.idx')
+
+
+class _PickledItem(object):
+    """
+    Already pickled item, copied between segments as it is.
+    """
+    def __init__(self, data, change_time, size, digest):
+        self.data = data
+        self.change_time = change_time
+        self.size = size
+        self.digest = digest
+
+
+_module_stores = {}
+
+
+def _get_module_store(cache_path=None):
+    directory = _get_cache_directory_path(cache_path=cache_path)
+    store = _module_stores.get(directory)
+    if store is None:
+        store = _module_stores[directory] = _ModuleStore(directory)
+    return store
+
+
+def close_module_stores():
+    """
+    Writes pending modules and closes the module stores of this process.
+    They are closed at exit, but processes exiting with ``os._exit``, like
+    multiprocessing workers, need to call this themselves.
+    """
+    for store in _module_stores.values():
+        store.close()
+
+
+def load_grammar_tables(hashed_grammar, cache_path=None):
+    """
+    Returns pgen grammar tables saved by :func:`save_grammar_tables` or None,
+    if there are none.
+    """
+    try:
+        path = _get_grammar_tables_path(hashed_grammar, cache_path=cache_path)
+        with open(path, 'rb') as f:
+            gc.disable()
+            try:
+                pgen_grammar = pickle.load(f)
+            finally:
+                gc.enable()
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Unreadable or broken, it's generated and saved again.
+        LOG.warning('Cannot load grammar tables %s', hashed_grammar, exc_info=True)
+        return None
+    LOG.debug('grammar tables loaded: %s', hashed_grammar)
+    return pgen_grammar
+
+
+def save_grammar_tables(hashed_grammar, pgen_grammar, cache_path=None):
+    """
+    Saves generated pgen grammar tables, so that other processes don't need
+    to generate them again. Fails silently, the tables are just a cache.
+    """
+    try:
+        path = _get_grammar_tables_path(hashed_grammar, cache_path=cache_path)
+        # Several processes may start at once, never let them read a half
+        # written file.
+        temp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            pickle.dump(pgen_grammar, f, pickle.HIGHEST_PROTOCOL)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # On Windows renaming fails, if another process has been faster.
+            os.remove(temp_path)
+    except (IOError, OSError):
+        LOG.warning('Cannot save grammar tables %s', hashed_grammar, exc_info=True)
 
 
 def clear_cache(cache_path=None):
     if cache_path is None:
         cache_path = _default_cache_path
+    close_module_stores()
+    _module_stores.clear()
     shutil.rmtree(cache_path)
     parser_cache.clear()
 
 
-def _get_hashed_path(hashed_grammar, path, cache_path=None):
+def _get_grammar_tables_path(hashed_grammar, cache_path=None):
     directory = _get_cache_directory_path(cache_path=cache_path)
-
-    file_hash = hashlib.sha256(path.encode("utf-8")).hexdigest()
-    return os.path.join(directory, '%s-%s.pkl' % (hashed_grammar, file_hash))
+    return os.path.join(directory, '%s-grammar-%s.pkl' % (
+        hashed_grammar, _GRAMMAR_TABLES_VERSION))
 
 
 def _get_cache_directory_path(cache_path=None):
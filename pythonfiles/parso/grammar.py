@@ -7,7 +7,8 @@ from parso.utils import split_lines, python_bytes_to_unicode, parse_version_stri
 from parso.python.diff import DiffParser
 from parso.python.tokenize import tokenize_lines, tokenize
 from parso.python import token
-from parso.cache import parser_cache, load_module, save_module
+from parso.cache import parser_cache, load_module, load_module_by_content, \
+    save_module, load_grammar_tables, save_grammar_tables
 from parso.parser import BaseParser
 from parso.python.parser import Parser as PythonParser
 from parso.python.errors import ErrorFinderConfig
@@ -29,14 +30,19 @@ class Grammar(object):
     _default_normalizer_config = pep8.PEP8NormalizerConfig()
 
     def __init__(self, text, tokenizer, parser=BaseParser, diff_parser=None):
-        self._pgen_grammar = generate_grammar(
-            text,
-            token_namespace=self._get_token_namespace()
-        )
+        self._hashed = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        # Generating the tables takes a while, they are generated once and
+        # loaded from the cache afterwards.
+        self._pgen_grammar = load_grammar_tables(self._hashed)
+        if self._pgen_grammar is None:
+            self._pgen_grammar = generate_grammar(
+                text,
+                token_namespace=self._get_token_namespace()
+            )
+            save_grammar_tables(self._hashed, self._pgen_grammar)
         self._parser = parser
         self._tokenizer = tokenizer
         self._diff_parser = diff_parser
-        self._hashed = hashlib.sha256(text.encode("utf-8")).hexdigest()
 
     def parse(self, code=None, **kwargs):
         """
@@ -65,6 +71,14 @@ class Grammar(object):
             under that path, because the contents of it might change. This
             option is still somewhat experimental. If you want stability,
             please don't use it.
+        :param list changed_ranges: Lines changed since the cached module was
+            parsed, as ``(old_start, old_end, new_start, new_end)`` tuples of
+            zero based, half open line ranges. Only used with ``diff_cache``;
+            if given, the lines are not diffed, the rest of them are assumed
+            to be equal.
+        :param bool compact: Shares equal strings between leaves and trims
+            lists of children, so that the tree takes less memory. It takes a
+            bit longer to parse.
         :param bool cache_path: If given saves the parso cache in this
             directory. If not given, defaults to the default cache places on
             each platform.
@@ -78,7 +92,8 @@ class Grammar(object):
 
     def _parse(self, code=None, error_recovery=True, path=None,
                start_symbol=None, cache=False, diff_cache=False,
-               cache_path=None, start_pos=(1, 0)):
+               changed_ranges=None, compact=False, cache_path=None,
+               start_pos=(1, 0)):
         """
         Wanted python3.5 * operator and keyword only arguments. Therefore just
         wrap it all.
@@ -127,7 +142,8 @@ class Grammar(object):
                     self._pgen_grammar, self._tokenizer, module_node
                 ).update(
                     old_lines=old_lines,
-                    new_lines=lines
+                    new_lines=lines,
+                    changed_ranges=changed_ranges
                 )
                 save_module(self._hashed, path, new_node, lines,
                             # Never pickle in pypy, it's slow as hell.
@@ -135,12 +151,19 @@ class Grammar(object):
                             cache_path=cache_path)
                 return new_node
 
+        if cache and path is not None:
+            module_node = load_module_by_content(self._hashed, path, code,
+                                                 cache_path=cache_path)
+            if module_node is not None:
+                return module_node
+
         tokens = self._tokenizer(lines, start_pos)
 
         p = self._parser(
             self._pgen_grammar,
             error_recovery=error_recovery,
-            start_symbol=start_symbol
+            start_symbol=start_symbol,
+            compact=compact
         )
         root_node = p.parse(tokens=tokens)
 
@@ -210,8 +233,9 @@ class PythonGrammar(Grammar):
         )
         self.version_info = version_info
 
-    def _tokenize_lines(self, lines, start_pos):
-        return tokenize_lines(lines, self.version_info, start_pos=start_pos)
+    def _tokenize_lines(self, lines, start_pos, **kwargs):
+        return tokenize_lines(lines, self.version_info, start_pos=start_pos,
+                              **kwargs)
 
     def _tokenize(self, code):
         # Used by Jedi.
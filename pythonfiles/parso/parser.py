@@ -38,10 +38,12 @@ class BaseParser(object):
     }
     default_leaf = tree.Leaf
 
-    def __init__(self, pgen_grammar, start_symbol='file_input', error_recovery=False):
+    def __init__(self, pgen_grammar, start_symbol='file_input', error_recovery=False,
+                 compact=False):
         self._pgen_grammar = pgen_grammar
         self._start_symbol = start_symbol
         self._error_recovery = error_recovery
+        self._compact = compact
 
     def parse(self, tokens):
         start_number = self._pgen_grammar.symbol2number[self._start_symbol]
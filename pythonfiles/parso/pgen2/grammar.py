@@ -74,7 +74,16 @@ class Grammar(object):
 
     tokens        -- a dict mapping token numbers to arc labels.
 
+    transitions   -- a dict mapping symbol numbers to the states of their
+                     DFAs compiled for the parser, made by
+                     make_transitions().  Each state is an (actions,
+                     accept) pair, where actions is a list indexed by
+                     token label and accept is ACCEPTING or ACCEPT_ONLY
+                     for final states (see make_transitions()).
+
     """
+    ACCEPTING = 1
+    ACCEPT_ONLY = 2
 
     def __init__(self, bnf_text):
         self.symbol2number = {}
@@ -87,6 +96,7 @@ class Grammar(object):
         self.symbol2label = {}
         self.label2symbol = {}
         self.start = 256
+        self.transitions = {}
 
     def dump(self, filename):
         """Dump the grammar tables to a pickle file."""
@@ -105,13 +115,47 @@ class Grammar(object):
         """
         new = self.__class__()
         for dict_attr in ("symbol2number", "number2symbol", "dfas", "keywords",
-                          "tokens", "symbol2label"):
+                          "tokens", "symbol2label", "transitions"):
             setattr(new, dict_attr, getattr(self, dict_attr).copy())
         new.labels = self.labels[:]
         new.states = self.states[:]
         new.start = self.start
         return new
 
+    def make_transitions(self):
+        """
+        Compiles the DFAs into dense tables, so that the parser finds what
+        to do with a token by indexing instead of scanning arcs and first
+        sets.
+
+        An action is a (newstate, symbol, dfa) tuple: the token is shifted
+        if symbol is None, otherwise the symbol with the given DFA is pushed
+        first. The first matching arc wins, like in the scan. Labels
+        without an action are None.
+        """
+        self.transitions = {}
+        for symbol, (states, first) in self.dfas.items():
+            compiled = []
+            for state, arcs in enumerate(states):
+                actions = [None] * len(self.labels)
+                for label, newstate in arcs:
+                    type_ = self.labels[label][0]
+                    if type_ >= 256:
+                        dfa = self.dfas[type_]
+                        for ilabel in dfa[1]:
+                            if actions[ilabel] is None:
+                                actions[ilabel] = (newstate, type_, dfa)
+                    elif label != 0 and actions[label] is None:
+                        actions[label] = (newstate, None, None)
+                if arcs == [(0, state)]:
+                    accept = self.ACCEPT_ONLY
+                elif (0, state) in arcs:
+                    accept = self.ACCEPTING
+                else:
+                    accept = 0
+                compiled.append((actions, accept))
+            self.transitions[symbol] = compiled
+
     def report(self):
         """Dump the grammar tables to standard output, for debugging."""
         from pprint import pprint
@@ -15,6 +15,7 @@ how this parsing engine works.
 """
 
 from parso.python import tokenize
+from parso.pgen2.grammar import Grammar
 
 
 class InternalParseError(Exception):
@@ -139,68 +140,47 @@ class PgenParser(object):
         """Add a token; return True if this is the end of the program."""
         ilabel = token_to_ilabel(self.grammar, type_, value)
 
-        # Loop until the token is shifted; may raise exceptions
-        _gram = self.grammar
-        _labels = _gram.labels
-        _push = self._push
-        _pop = self._pop
-        _shift = self._shift
+        # Loop until the token is shifted; may raise exceptions. Actions are
+        # looked up in the compiled transitions, see
+        # Grammar.make_transitions().
+        transitions = self.grammar.transitions
+        stack = self.stack
         while True:
-            dfa, state, node = self.stack[-1]
-            states, first = dfa
-            arcs = states[state]
-            # Look for a state with this label
-            for i, newstate in arcs:
-                t, v = _labels[i]
-                if ilabel == i:
-                    # Look it up in the list of labels
-                    assert t < 256
-                    # Shift a token; we're done with it
-                    _shift(type_, value, newstate, prefix, start_pos)
-                    # Pop while we are in an accept-only state
-                    state = newstate
-                    while states[state] == [(0, state)]:
-                        _pop()
-                        if not self.stack:
-                            # Done parsing!
-                            return True
-                        dfa, state, node = self.stack[-1]
-                        states, first = dfa
-                    # Done with this token
-                    return False
-                elif t >= 256:
-                    # See if it's a symbol and if we're in its first set
-                    itsdfa = _gram.dfas[t]
-                    itsstates, itsfirst = itsdfa
-                    if ilabel in itsfirst:
-                        # Push a symbol
-                        _push(t, itsdfa, newstate)
-                        break  # To continue the outer while loop
-            else:
-                if (0, state) in arcs:
+            dfa, state, node = stack[-1]
+            actions, accept = transitions[node[0]][state]
+            action = None if ilabel is None else actions[ilabel]
+            if action is None:
+                if accept:
                     # An accepting state, pop it and try something else
-                    _pop()
-                    if not self.stack:
+                    self._pop()
+                    if not stack:
                         # Done parsing, but another token is input
                         raise InternalParseError("too much input", type_, value, start_pos)
-                else:
-                    self.error_recovery(self.grammar, self.stack, arcs, type_,
-                                        value, start_pos, prefix, self.add_token)
-                    break
-
-    def _shift(self, type_, value, newstate, prefix, start_pos):
-        """Shift a token.  (Internal)"""
-        dfa, state, node = self.stack[-1]
-        newnode = self.convert_leaf(self.grammar, type_, value, prefix, start_pos)
-        node[-1].append(newnode)
-        self.stack[-1] = (dfa, newstate, node)
-
-    def _push(self, type_, newdfa, newstate):
-        """Push a nonterminal.  (Internal)"""
-        dfa, state, node = self.stack[-1]
-        newnode = (type_, [])
-        self.stack[-1] = (dfa, newstate, node)
-        self.stack.append((newdfa, 0, newnode))
+                    continue
+                self.error_recovery(self.grammar, stack, dfa[0][state], type_,
+                                    value, start_pos, prefix, self.add_token)
+                break
+
+            newstate, symbol, newdfa = action
+            if symbol is not None:
+                # Push a symbol
+                stack[-1] = (dfa, newstate, node)
+                stack.append((newdfa, 0, (symbol, [])))
+                continue
+
+            # Shift a token; we're done with it
+            node[1].append(self.convert_leaf(self.grammar, type_, value, prefix, start_pos))
+            stack[-1] = (dfa, newstate, node)
+            # Pop while we are in an accept-only state
+            state = newstate
+            while transitions[node[0]][state][1] == Grammar.ACCEPT_ONLY:
+                self._pop()
+                if not stack:
+                    # Done parsing!
+                    return True
+                dfa, state, node = stack[-1]
+            # Done with this token
+            return False
 
     def _pop(self):
         """Pop a nonterminal.  (Internal)"""
@@ -47,6 +47,7 @@ class ParserGenerator(object):
             c.states.append(states)
             c.dfas[c.symbol2number[name]] = (states, self._make_first(c, name))
         c.start = c.symbol2number[self.startsymbol]
+        c.make_transitions()
         return c
 
     def _make_first(self, c, name):
@@ -8,13 +8,15 @@ fragments.
 import re
 import difflib
 from collections import namedtuple
+import itertools
 import logging
 
 from parso.utils import split_lines
 from parso.python.parser import Parser
+from parso.tree import BaseNode
 from parso.python.tree import EndMarker
 from parso.python.tokenize import (NEWLINE, PythonToken, ERROR_DEDENT,
-                                   ENDMARKER, INDENT, DEDENT)
+                                   ENDMARKER, INDENT, DEDENT, ERRORTOKEN)
 
 LOG = logging.getLogger(__name__)
 
@@ -69,21 +71,115 @@ def _is_flow_node(node):
     return value in ('if', 'for', 'while', 'try')
 
 
+def _get_opcodes(old_lines, new_lines, changed_ranges):
+    """
+    Builds difflib-like opcodes from changed line ranges, given as
+    ``(old_start, old_end, new_start, new_end)`` tuples of zero based, half
+    open ranges. Lines outside of the ranges are assumed to be equal.
+    """
+    opcodes = []
+    i = j = 0
+    for i1, i2, j1, j2 in sorted(changed_ranges):
+        if i1 < i or i2 < i1 or j2 < j1 or i1 - i != j1 - j:
+            raise ValueError("Invalid changed line range: %s"
+                             % ((i1, i2, j1, j2),))
+        if i < i1:
+            opcodes.append(('equal', i, i1, j, j1))
+        if i1 < i2 and j1 < j2:
+            opcodes.append(('replace', i1, i2, j1, j2))
+        elif i1 < i2:
+            opcodes.append(('delete', i1, i2, j1, j2))
+        elif j1 < j2:
+            opcodes.append(('insert', i1, i2, j1, j2))
+        i, j = i2, j2
+
+    if len(old_lines) - i != len(new_lines) - j:
+        raise ValueError("Changed line ranges don't match the lines.")
+    if i < len(old_lines):
+        opcodes.append(('equal', i, len(old_lines), j, len(new_lines)))
+    return opcodes
+
+
+def _collect_names(nodes, dct):
+    for node in nodes:
+        if isinstance(node, BaseNode):
+            _collect_names(node.children, dct)
+        elif node.type == 'name':
+            dct.setdefault(node.value, {})[id(node)] = node
+
+
+def _update_used_names(used_names, removed_nodes, added_nodes):
+    """
+    Brings names of ``Module.get_used_names()`` up to date after an update,
+    visiting only the nodes that have been removed or added.
+    """
+    # Added nodes may contain each other, e.g. a new class and its suite,
+    # that got copied nodes appended. Names are collected by id therefore.
+    removed = {}
+    _collect_names(removed_nodes, removed)
+    added = {}
+    _collect_names(added_nodes, added)
+    for value in set(removed) | set(added):
+        removed_names = removed.get(value, {})
+        names = added.get(value, {})
+        for name in used_names.get(value, ()):
+            if id(name) not in removed_names:
+                names[id(name)] = name
+        if names:
+            used_names[value] = sorted(
+                names.values(), key=lambda name: (name.line, name.column))
+        else:
+            used_names.pop(value, None)
+
+
+def _resume_tokens(incremental_tokenizer, first_line):
+    """
+    Returns the tokens of an :class:`IncrementalTokenizer` from the zero based
+    ``first_line`` on, starting like the tokenizer does in a fresh state
+    there, or None, if the state of the line is different from that.
+
+    Later indents and dedents are relative to the indentation of the lines
+    before, so dedents may follow each other, where a fresh tokenizer yields
+    just one.
+    """
+    if not first_line:
+        return incremental_tokenizer.get_tokens()
+    state = incremental_tokenizer.get_state(first_line)
+    if state.paren_level or state.string_quote is not None \
+            or not state.new_line:
+        return None
+    tokens = incremental_tokenizer.get_tokens(first_line)
+    for typ, string, start_pos, prefix in tokens:
+        if typ not in (INDENT, DEDENT):
+            break
+    if typ in (ERROR_DEDENT, ERRORTOKEN):
+        # An error dedent leaves indentation of the lines before, that a
+        # fresh tokenizer doesn't know about.
+        return None
+    # The comments and empty lines before the line aren't part of it.
+    first_tokens = [PythonToken(typ, string, start_pos,
+                                prefix[state.prefix_length:])]
+    line = incremental_tokenizer.lines[start_pos[0] - 1]
+    if typ != ENDMARKER and start_pos[1] > len(line) - len(line.lstrip('\f')):
+        first_tokens.insert(0, PythonToken(INDENT, '', start_pos, ''))
+    return itertools.chain(first_tokens, tokens)
+
+
 class _PositionUpdatingFinished(Exception):
     pass
 
 
 def _update_positions(nodes, line_offset, last_leaf):
+    # Every leaf after a change is visited here, which makes it the slowest
+    # part of small updates. Checking the type is a lot cheaper than
+    # catching an AttributeError for every leaf.
     for node in nodes:
-        try:
-            children = node.children
-        except AttributeError:
-            # Is a leaf
+        if isinstance(node, BaseNode):
+            _update_positions(node.children, line_offset, last_leaf)
+        else:
             node.line += line_offset
             if node is last_leaf:
                 raise _PositionUpdatingFinished
-        else:
-            _update_positions(children, line_offset, last_leaf)
 
 
 class DiffParser(object):
@@ -91,10 +187,12 @@ class DiffParser(object):
     An advanced form of parsing a file faster. Unfortunately comes with huge
     side effects. It changes the given module.
     """
-    def __init__(self, pgen_grammar, tokenizer, module):
+    def __init__(self, pgen_grammar, tokenizer, module,
+                 incremental_tokenizer=None):
         self._pgen_grammar = pgen_grammar
         self._tokenizer = tokenizer
         self._module = module
+        self._incremental_tokenizer = incremental_tokenizer
 
     def _reset(self):
         self._copy_count = 0
@@ -102,8 +200,18 @@ class DiffParser(object):
 
         self._nodes_stack = _NodesStack(self._module)
 
-    def update(self, old_lines, new_lines):
+    def update(self, old_lines, new_lines, changed_ranges=None):
         '''
+        If the caller knows which lines have changed (e.g. an editor), it may
+        pass them as ``changed_ranges``, a list of ``(old_start, old_end,
+        new_start, new_end)`` tuples of zero based, half open line ranges.
+        Lines outside of them are taken as equal without comparing, otherwise
+        the lines are compared with difflib, which is slow for big files.
+
+        If the parser has been given an :class:`IncrementalTokenizer`, that
+        has been updated to the new lines, its tokens are parsed instead of
+        tokenizing the lines again.
+
         The algorithm works as follows:
 
         Equal:
@@ -119,16 +227,26 @@ class DiffParser(object):
         Returns the new module node.
         '''
         LOG.debug('diff parser start')
-        # Reset the used names cache so they get regenerated.
+        # The used names are reset while the tree changes and updated for
+        # the changed nodes afterwards, if they have been needed so far.
+        used_names = self._module._used_names
         self._module._used_names = None
 
         self._parser_lines_new = new_lines
+        incremental_tokenizer = self._incremental_tokenizer
+        if incremental_tokenizer is not None \
+                and incremental_tokenizer.lines is not new_lines:
+            incremental_tokenizer = None
+        self._tokens_of_lines = incremental_tokenizer
 
         self._reset()
 
         line_length = len(new_lines)
-        sm = difflib.SequenceMatcher(None, old_lines, self._parser_lines_new)
-        opcodes = sm.get_opcodes()
+        if changed_ranges is None:
+            sm = difflib.SequenceMatcher(None, old_lines, self._parser_lines_new)
+            opcodes = sm.get_opcodes()
+        else:
+            opcodes = _get_opcodes(old_lines, new_lines, changed_ranges)
         LOG.debug('diff parser calculated')
         LOG.debug('diff: line_lengths old: %s, new: %s' % (len(old_lines), line_length))
 
@@ -153,6 +271,9 @@ class DiffParser(object):
         # With this action all change will finally be applied and we have a
         # changed module.
         self._nodes_stack.close()
+        if used_names is not None:
+            _update_used_names(used_names, *self._nodes_stack.get_changed_nodes())
+            self._module._used_names = used_names
 
         last_pos = self._module.end_pos[0]
         if last_pos != line_length:
@@ -269,15 +390,11 @@ class DiffParser(object):
         ended.
         """
         self._parser_count += 1
-        # TODO speed up, shouldn't copy the whole list all the time.
-        # memoryview?
         parsed_until_line = self._nodes_stack.parsed_until_line
-        lines_after = self._parser_lines_new[parsed_until_line:]
-        #print('parse_content', parsed_until_line, lines_after, until_line)
         tokens = self._diff_tokenize(
-            lines_after,
+            self._parser_lines_new,
             until_line,
-            line_offset=parsed_until_line
+            first_line=parsed_until_line
         )
         self._active_parser = Parser(
             self._pgen_grammar,
@@ -285,14 +402,19 @@ class DiffParser(object):
         )
         return self._active_parser.parse(tokens=tokens)
 
-    def _diff_tokenize(self, lines, until_line, line_offset=0):
+    def _diff_tokenize(self, lines, until_line, first_line=0):
         is_first_token = True
         omitted_first_indent = False
         indents = []
-        tokens = self._tokenizer(lines, (1, 0))
+        tokens = None
+        if self._tokens_of_lines is not None:
+            tokens = _resume_tokens(self._tokens_of_lines, first_line)
+        if tokens is None:
+            # The tokenizer resumes at the first line in a fresh state,
+            # instead of tokenizing a copy of the lines after it.
+            tokens = self._tokenizer(lines, (1, 0), first_line=first_line)
         stack = self._active_parser.pgen_parser.stack
         for typ, string, start_pos, prefix in tokens:
-            start_pos = start_pos[0] + line_offset, start_pos[1]
             if typ == INDENT:
                 indents.append(start_pos[1])
                 if is_first_token:
@@ -313,11 +435,14 @@ class DiffParser(object):
                     # We are done here, only thing that can come now is an
                     # endmarker or another dedented code block.
                     typ, string, start_pos, prefix = next(tokens)
+                    while typ in (DEDENT, ERROR_DEDENT):
+                        # Resumed tokens dedent further, see _resume_tokens.
+                        typ, string, start_pos, prefix = next(tokens)
                     if '\n' in prefix:
                         prefix = re.sub(r'(<=\n)[^\n]+$', '', prefix)
                     else:
                         prefix = ''
-                    yield PythonToken(ENDMARKER, '', (start_pos[0] + line_offset, 0), prefix)
+                    yield PythonToken(ENDMARKER, '', (start_pos[0], 0), prefix)
                     break
             elif typ == NEWLINE and start_pos[0] >= until_line:
                 yield PythonToken(typ, string, start_pos, prefix)
@@ -398,6 +523,8 @@ class _NodesStack(object):
         self._module = module
         self._last_prefix = ''
         self.prefix = ''
+        self._old_children = []     # children of closed nodes before
+        self._new_children = []     # and after closing them
 
     def is_empty(self):
         return not self._base_node.children
@@ -429,10 +556,27 @@ class _NodesStack(object):
             node = self._close_tos()
 
     def _close_tos(self):
+        tree_node = self._tos.tree_node
+        self._old_children.append(tree_node.children)
         self._tos.close()
+        self._new_children.append(tree_node.children)
         self._tos = self._tos.parent
         return self._tos
 
+    def get_changed_nodes(self):
+        """
+        Returns nodes that have been removed from the tree and nodes that
+        have been added to it, found by comparing children of the closed
+        nodes. Nodes moved to another parent are in neither of them.
+        """
+        old = dict((id(node), node) for children in self._old_children
+                   for node in children)
+        new = dict((id(node), node) for children in self._new_children
+                   for node in children)
+        removed = [node for key, node in old.items() if key not in new]
+        added = [node for key, node in new.items() if key not in old]
+        return removed, added
+
     def add_parsed_nodes(self, tree_nodes):
         tree_nodes = self._remove_endmarker(tree_nodes)
         if not tree_nodes:
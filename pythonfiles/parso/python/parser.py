@@ -50,12 +50,16 @@ class Parser(BaseParser):
     }
     default_node = tree.PythonNode
 
-    def __init__(self, pgen_grammar, error_recovery=True, start_symbol='file_input'):
-        super(Parser, self).__init__(pgen_grammar, start_symbol, error_recovery=error_recovery)
+    def __init__(self, pgen_grammar, error_recovery=True, start_symbol='file_input',
+                 compact=False):
+        super(Parser, self).__init__(pgen_grammar, start_symbol,
+                                     error_recovery=error_recovery,
+                                     compact=compact)
 
         self.syntax_errors = []
         self._omit_dedent_list = []
         self._indent_counter = 0
+        self._strings = {}
 
         # TODO do print absolute import detection here.
         # try:
@@ -97,6 +101,9 @@ class Parser(BaseParser):
         """
         # TODO REMOVE symbol, we don't want type here.
         symbol = pgen_grammar.number2symbol[type]
+        if self._compact:
+            # Lists grown by appending have spare room, a slice has not.
+            children = children[:]
         try:
             return self.node_map[symbol](children)
         except KeyError:
@@ -116,6 +123,11 @@ class Parser(BaseParser):
 
     def convert_leaf(self, pgen_grammar, type, value, prefix, start_pos):
         # print('leaf', repr(value), token.tok_name[type])
+        if self._compact:
+            # The same names, operators and whitespace prefixes come up over
+            # and over again, keep just one copy of each.
+            value = self._strings.setdefault(value, value)
+            prefix = self._strings.setdefault(prefix, prefix)
         if type == NAME:
             if value in pgen_grammar.keywords:
                 return tree.Keyword(value, start_pos, prefix)
@@ -226,19 +226,55 @@ class PythonToken(Token):
                 self._replace(type=self._get_type_name()))
 
 
+class TokenizerState(namedtuple('TokenizerState', [
+        'indents', 'paren_level', 'new_line', 'prefix_length',
+        'string_length', 'string_quote'])):
+    """
+    State of the tokenizer at the start of a line, see ``tokenize_lines``.
+
+    The ``prefix_length`` characters before the line are the prefix of the
+    next token. Within a string spanning lines, which started
+    ``string_length`` characters before the line and is ended by the quotes
+    ``string_quote``, they are the prefix of the string instead. Lengths
+    rather than text keep the states of most lines equal.
+    """
+
+
+def _text_before(lines, position, length):
+    """
+    Returns ``length`` characters of lines before a ``(line index, column)``
+    position, and the position they start at.
+    """
+    index, column = position
+    parts = []
+    while length > column:
+        parts.append(lines[index][:column])
+        length -= column
+        index -= 1
+        column = len(lines[index])
+    parts.append(lines[index][column - length:column])
+    return ''.join(reversed(parts)), (index, column - length)
+
+
 def tokenize(code, version_info, start_pos=(1, 0)):
     """Generate tokens from a the source code (string)."""
     lines = split_lines(code, keepends=True)
     return tokenize_lines(lines, version_info, start_pos=start_pos)
 
 
-def tokenize_lines(lines, version_info, start_pos=(1, 0)):
+def tokenize_lines(lines, version_info, start_pos=(1, 0), first_line=0,
+                   state=None, line_states=None):
     """
     A heavily modified Python standard library tokenizer.
 
     Additionally to the default information, yields also the prefix of each
     token. This idea comes from lib2to3. The prefix contains all information
     that is irrelevant for the parser like newlines in parentheses or comments.
+
+    Tokenizing starts at ``lines[first_line]`` in a fresh state or in the
+    :class:`TokenizerState` given, which the tokenizer had at the start of
+    that line. If ``line_states`` is a list, the state at the start of every
+    line is appended to it. Equal states are the same object.
     """
     pseudo_token, single_quoted, triple_quoted, endpats, always_break_tokens, = \
         _get_token_collection(version_info)
@@ -257,7 +293,42 @@ def tokenize_lines(lines, version_info, start_pos=(1, 0)):
     additional_prefix = ''
     first = True
     lnum = start_pos[0] - 1
+    if state is not None:
+        indents = list(state.indents)
+        paren_level = state.paren_level
+        new_line = state.new_line
+        position = first_line, 0
+        if state.string_quote is not None:
+            contstr, position = _text_before(lines, position,
+                                             state.string_length)
+            contstr_quote = state.string_quote
+            endprog = endpats[contstr_quote]
+            contstr_start = start_pos[0] + position[0], position[1]
+            if position[0] == 0:
+                # Columns of the first line are shifted like below.
+                contstr_start = contstr_start[0], contstr_start[1] + \
+                    start_pos[1] - lines[0].startswith(BOM_UTF8_STRING)
+            contline = contstr
+            prefix, _ = _text_before(lines, position, state.prefix_length)
+        else:
+            additional_prefix, _ = _text_before(lines, position,
+                                                state.prefix_length)
+    if first_line:
+        lines = _itertools.islice(lines, first_line, None)
+        lnum += first_line
+        first = False
+    known_states = {}
     for line in lines:  # loop over lines in stream
+        if line_states is not None:
+            if contstr:
+                line_state = TokenizerState(
+                    tuple(indents), paren_level, new_line, len(prefix),
+                    len(contstr), contstr_quote)
+            else:
+                line_state = TokenizerState(
+                    tuple(indents), paren_level, new_line,
+                    len(additional_prefix), 0, None)
+            line_states.append(known_states.setdefault(line_state, line_state))
         lnum += 1
         pos = 0
         max = len(line)
@@ -339,6 +410,7 @@ def tokenize_lines(lines, version_info, start_pos=(1, 0)):
                 assert not token.endswith("\n")
                 additional_prefix = prefix + token
             elif token in triple_quoted:
+                contstr_quote = token
                 endprog = endpats[token]
                 endmatch = endprog.match(line, pos)
                 if endmatch:                                # all on one line
@@ -355,8 +427,10 @@ def tokenize_lines(lines, version_info, start_pos=(1, 0)):
                     token[:3] in single_quoted:
                 if token[-1] == '\n':                       # continued string
                     contstr_start = lnum, start
-                    endprog = (endpats.get(initial) or endpats.get(token[1])
-                               or endpats.get(token[2]))
+                    for contstr_quote in token[:3]:
+                        if contstr_quote in endpats:
+                            break
+                    endprog = endpats[contstr_quote]
                     contstr = line[start:]
                     contline = line
                     break
@@ -403,6 +477,129 @@ def tokenize_lines(lines, version_info, start_pos=(1, 0)):
     yield PythonToken(ENDMARKER, '', end_pos, additional_prefix)
 
 
+def _find_change(old_lines, new_lines):
+    """
+    Returns the index of the first changed line and the ends of the changed
+    lines in old and new lines, found by comparing lines from both ends.
+    """
+    length = min(len(old_lines), len(new_lines))
+    start = 0
+    while start < length and old_lines[start] == new_lines[start]:
+        start += 1
+    end = 0
+    while end < length - start and old_lines[-1 - end] == new_lines[-1 - end]:
+        end += 1
+    return start, len(old_lines) - end, len(new_lines) - end
+
+
+class IncrementalTokenizer(object):
+    """
+    Tokens of lines, that are brought up to date after changes by tokenizing
+    only what has changed.
+
+    The tokenizer state at the start of every line is kept. After a change,
+    tokenizing starts again at the first changed line in the state it had
+    there, and stops at the first line after the change, where the state is
+    the same as at that line before. The old tokens are used from there on.
+    They are kept relative to the line they were tokenized at, so that they
+    don't need to be moved, when lines are inserted or removed.
+    """
+    def __init__(self, version_info, lines):
+        self.version_info = version_info
+        self.lines = []
+        self.tokenized_lines = 0    # by the last update
+        self._states = []
+        # Tokens tokenized after the state of each line, as (type, string,
+        # lines after that line, column, prefix) tuples.
+        self._tokens = []
+        self.update(lines)
+
+    def update(self, new_lines, changed_ranges=None):
+        """
+        Takes new lines, as returned by ``split_lines(code, keepends=True)``.
+        If the changed lines are known, they may be passed as
+        ``changed_ranges`` like to :py:meth:`DiffParser.update`, otherwise
+        lines are compared.
+        """
+        old_lines = self.lines
+        if changed_ranges is None:
+            first, old_end, new_end = _find_change(old_lines, new_lines)
+        elif changed_ranges:
+            changed_ranges = sorted(changed_ranges)
+            first = changed_ranges[0][0]
+            old_end, new_end = changed_ranges[-1][1], changed_ranges[-1][3]
+        else:
+            first = old_end = new_end = len(old_lines)
+        if len(old_lines) - old_end != len(new_lines) - new_end:
+            raise ValueError("Changed line ranges don't match the lines.")
+        self.lines = new_lines
+        if old_lines and first == old_end == new_end:
+            self.tokenized_lines = 0    # nothing has changed
+            return
+        # The state of the line after the last one isn't known.
+        first = min(first, len(old_lines) - 1)
+        if first < 0:
+            first, state = 0, None
+        else:
+            state = self._states[first]
+        offset = new_end - old_end
+
+        states = []
+        tokens = []
+        unchanged = 0   # length of the lines after the change checked so far
+        synchronized = None
+        for typ, string, (line, column), prefix in tokenize_lines(
+                new_lines, self.version_info, first_line=first, state=state,
+                line_states=states):
+            # A new line has been started by the tokenizer.
+            while len(tokens) < len(states):
+                index = first + len(tokens)
+                if index > new_end:
+                    unchanged += len(new_lines[index - 1])
+                if index >= new_end and index - offset < len(self._states):
+                    state = states[len(tokens)]
+                    # Prefixes and strings the state continues have to be
+                    # in the unchanged lines as well.
+                    pending = state.prefix_length + state.string_length
+                    if state == self._states[index - offset] and \
+                            pending <= unchanged:
+                        synchronized = index
+                        break
+                tokens.append([])
+            if synchronized is not None:
+                break
+            tokens[-1].append(
+                (typ, string, line - first - len(tokens), column, prefix))
+
+        self.tokenized_lines = len(tokens)
+        if synchronized is None:
+            self._states[first:] = states
+            self._tokens[first:] = tokens
+        else:
+            del states[len(tokens):]
+            old_index = synchronized - offset
+            self._states[first:old_index] = states
+            self._tokens[first:old_index] = tokens
+
+    def get_state(self, line):
+        """
+        Returns the :class:`TokenizerState` at the start of the zero based
+        line.
+        """
+        return self._states[line]
+
+    def get_tokens(self, first_line=0):
+        """
+        Yields the tokens of the lines like ``tokenize_lines``, resuming at
+        ``first_line`` in the state of that line.
+        """
+        lines = _itertools.islice(self._tokens, first_line, None)
+        for line, tokens in enumerate(lines, first_line + 1):
+            for typ, string, line_offset, column, prefix in tokens:
+                yield PythonToken(typ, string, (line + line_offset, column),
+                                  prefix)
+
+
 if __name__ == "__main__":
     if len(sys.argv) >= 2:
         path = sys.argv[1]
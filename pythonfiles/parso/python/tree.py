@@ -263,6 +263,8 @@ class String(Literal):
 
 
 class _StringComparisonMixin(object):
+    __slots__ = ()
+
     def __eq__(self, other):
         """
         Make comparisons with strings easy.
@@ -22,14 +22,27 @@
 # SOFTWARE.
 
 from json import loads, dumps
+from collections import OrderedDict
+from hashlib import sha1
+from itertools import count
+from heapq import nsmallest
+import zlib
+from multiprocessing import Process, Pipe, Value
+from subprocess import Popen, PIPE
+from threading import Thread
+import os
 import sys
 import re
+import time
 from traceback import format_tb
 
 PY2 = sys.version_info.major == 2
 
 if PY2:
     from string import split
+    from Queue import Queue
+else:
+    from queue import Queue
 
 
 def split_docstring(string):
@@ -41,13 +54,31 @@ def split_docstring(string):
 
 TRIM_REGEX = r"(^[=*]+|[=*]+$)"
 TRIM_REGEX = re.compile(TRIM_REGEX)
+NAME_PREFIX_REGEX = re.compile(r"\w*$", re.UNICODE)
 
 try:
     import jedi # noqa
+    import parso
+    from jedi.evaluate import Evaluator
+    from jedi.evaluate.project import Project
+    from jedi.evaluate.context import ModuleContext
+    from jedi.evaluate.identifier_index import get_identifier_index
+    from jedi.evaluate.symbol_index import get_symbol_index
+    from jedi.evaluate.usages import find_definitions, find_usages_in_module
+    from jedi.evaluate.utils import Cancelled
+    from jedi.parser_utils import get_parent_scope
+    from parso import split_lines, python_bytes_to_unicode
+    from parso.cache import close_module_stores, parser_cache, save_module
+    from parso.python.diff import DiffParser
+    from parso.python.tokenize import IncrementalTokenizer
+    from parso.python.pep8 import PEP8NormalizerConfig
     WITH_JEDI = True
 except ImportError:
     WITH_JEDI = False
 
+    class Cancelled(Exception):
+        pass
+
 # try:
 #     from tinyhtmlwriter import format_docs
 #     WITH_DOCUTILS = True
@@ -58,28 +89,700 @@ except ImportError:
 WITH_DOCUTILS = False
 
 
+DEFAULT_WORKERS = 2
+# Seconds workers get to write their caches, when the pool exits.
+WORKER_EXIT_TIMEOUT = 5.0
+# Modules loaded by session are checked for changes on disk at most this
+# often, in seconds.
+SESSION_CHECK_INTERVAL = 2.0
+RESOLVE_CACHE_SIZE = 500
+LINT_CACHE_SIZE = 20
+# Limits of parsed trees kept in memory: number of modules and total length
+# of their code in characters, a tree takes about 40 bytes per character.
+PARSER_CACHE_ITEMS = 1000
+PARSER_CACHE_SIZE = 5 * 1000 * 1000
+DEFAULT_MAX_COMPLETIONS = 40
+DEFAULT_MAX_SYMBOLS = 50
+# Messages are framed as "<encoding> <length>\n" header followed by
+# <length> bytes of payload. Encoding is either plain JSON or JSON
+# compressed with zlib, used for large responses.
+ENCODING_JSON = b"json"
+ENCODING_ZLIB = b"zlib"
+# Kinds of requests, where a newer request for the same file makes older
+# ones obsolete.
+SUPERSEDED_REQUESTS = ("autocomplete", "docs", "symbols")
+# Lint codes of pycodestyle warnings among parso's issue codes, the rest are
+# errors. Syntax and indentation errors are reported by flake8 as E999.
+LINT_WARNINGS = (291, 292, 293, 391)
+LINT_SYNTAX_ERRORS = (901, 903)
+LINT_UNFINISHED = (135, 136)   # rules parso doesn't really implement yet
+# Checks flake8 skips, unless the ignore list is given explicitly.
+LINT_DEFAULT_IGNORE = ("E121", "E123", "E126", "E226", "E24", "E704",
+                       "W503", "W504")
+# Private methods of flake8's Application, that flake8 3.0 - 3.7 are set up
+# in process with. Other versions are run in a separate process, with errors
+# written out in this format.
+FLAKE8_APPLICATION_METHODS = (
+    "parse_preliminary_options_and_args", "make_config_finder",
+    "find_plugins", "register_plugin_options", "parse_configuration_and_cli",
+    "make_formatter", "make_notifier", "make_guide")
+FLAKE8_FORMAT = "%(row)d:%(col)d:%(code)s:%(text)s"
+FLAKE8_OUTPUT_REGEX = re.compile(r"^(\d+):(\d+):(\w+):(.*)$")
+# Warm up steps, done by every worker after setup, and the code completed
+# to do them. Modules given in "preload_modules" setting are warmed up too.
+WARM_UP_STEPS = ("grammar", "builtins", "typing")
+WARM_UP_SOURCES = {
+    "builtins": "str().",
+    "typing": "import typing; typing.",
+    "module": "import %s as x; x."
+}
+# All flake8 and symbols requests go to the first worker, so that flake8 is
+# imported, its results are cached and symbol index is kept by one process
+# only.
+FIRST_WORKER_REQUESTS = ("flake8", "symbols")
+# Usages search checks files of the project in parts of about this many files,
+# spread across workers. Parts only run when no other request is waiting.
+USAGES_CHUNK_FILES = 100
+SEARCH_REQUESTS = ("usages", "usages_in")
+BACKGROUND_REQUESTS = ("usages_in",)
+
+
 class PythonToolsError(Exception):
     """ Class for python tools errors """
     __name__ = "PythonToolsError"
 
 
+class Flake8UnavailableError(PythonToolsError):
+    """ Flake8 is not installed or its version is not supported """
+    __name__ = "Flake8UnavailableError"
+
+
+def error_response(error, request_id=None):
+    """
+    Builds an error response for an exception being handled.
+    """
+    return {
+        "id": request_id,
+        "status": "ERROR",
+        "error": {
+            "name": error.__class__.__name__,
+            "value": str(error),
+            "traceback": format_tb(sys.exc_info()[2])
+        }
+    }
+
+
+def binary_stream(stream):
+    """
+    Returns binary version of standard stream.
+    """
+    if PY2:
+        if sys.platform == "win32":
+            import msvcrt
+            msvcrt.setmode(stream.fileno(), os.O_BINARY)
+        return stream
+    return stream.buffer
+
+
+def detached_stdin():
+    """
+    Returns binary stream reading stdin through a file descriptor of its
+    own. A thread blocked reading sys.stdin holds its lock, and workers
+    forked meanwhile hang forever closing sys.stdin on start.
+    """
+    fd = os.dup(sys.stdin.fileno())
+    if sys.platform == "win32":
+        import msvcrt
+        msvcrt.setmode(fd, os.O_BINARY)
+    return os.fdopen(fd, "rb")
+
+
+def read_message(stream):
+    """
+    Reads single framed message from binary stream and deserializes it.
+    Returns None at the end of stream.
+    """
+    header = stream.readline()
+    if not header:
+        return None
+    try:
+        encoding, length = header.split()
+        length = int(length)
+    except ValueError:
+        raise PythonToolsError("Malformed message header: %r" % header)
+
+    chunks = []
+    while length > 0:
+        chunk = stream.read(length)
+        if not chunk:
+            raise PythonToolsError("Unexpected end of message")
+        chunks.append(chunk)
+        length -= len(chunk)
+    payload = b"".join(chunks)
+
+    if encoding == ENCODING_ZLIB:
+        payload = zlib.decompress(payload)
+    elif encoding != ENCODING_JSON:
+        raise PythonToolsError("Unknown message encoding: %r" % encoding)
+    return loads(payload.decode("utf-8"))
+
+
+def write_message(stream, message, compression_threshold=0):
+    """
+    Serializes message and writes it to binary stream. Messages larger
+    than compression threshold are compressed, zero disables compression.
+    """
+    payload = dumps(message).encode("utf-8")
+    encoding = ENCODING_JSON
+    if 0 < compression_threshold <= len(payload):
+        payload = zlib.compress(payload)
+        encoding = ENCODING_ZLIB
+    stream.write(encoding + b" " + str(len(payload)).encode("ascii") + b"\n")
+    stream.write(payload)
+    stream.flush()
+
+
+class LRUCache(object):
+    """
+    Small dict-like cache, evicting least recently used entries.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            return default
+        self._items[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._items.pop(key, None)
+        self._items[key] = value
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+def completion_scope_rank(completion, module_node):
+    """
+    Ranks where completion is defined: names local to a function or class
+    of the current module come first, then its module level names, then
+    names from other modules and builtins last.
+    """
+    tree_name = completion._name.tree_name
+    if tree_name is not None and tree_name.get_root_node() is module_node:
+        definition = tree_name.get_definition() or tree_name
+        if get_parent_scope(definition) is module_node:
+            return 1
+        return 0
+    if completion.in_builtin_module():
+        return 3
+    return 2
+
+
+def prefix_match_rank(name, prefix):
+    """
+    Ranks how well name matches the typed prefix: exact and case-sensitive
+    matches come first, private and magic names are pushed down unless
+    the prefix asks for them.
+    """
+    if not name.startswith(prefix):
+        rank = 1    # matched case-insensitively
+    else:
+        rank = 0
+    if name.startswith("__") and not prefix.startswith("__"):
+        rank += 4
+    elif name.startswith("_") and not prefix.startswith("_"):
+        rank += 2
+    return rank
+
+
+def usage_key(name):
+    """
+    Identifies a name usages are compared by, the same way in every worker:
+    by module path and position, or by type and name for names without a
+    tree, e.g. of builtins.
+    """
+    if name.tree_name is None:
+        return (None, name.api_type, name.string_name)
+    return (name.get_root_context().py__file__(),
+            name.tree_name.line, name.tree_name.column)
+
+
+def lint_code(code):
+    """
+    Converts parso's numeric issue code to flake8's code.
+    """
+    if code in LINT_SYNTAX_ERRORS:
+        return "E999"
+    if code in LINT_WARNINGS:
+        return "W%d" % code
+    return "E%d" % code
+
+
+def hash_source(source):
+    if not isinstance(source, bytes):
+        source = source.encode("utf-8", "replace")
+    return sha1(source).hexdigest()
+
+
+def hash_file(path):
+    try:
+        with open(path, "rb") as f:
+            return hash_source(f.read())
+    except (IOError, OSError):
+        return None
+
+
+def module_name(path):
+    """
+    Returns the name a module at path is imported by, without its package.
+    """
+    directory, file_name = os.path.split(path)
+    name = os.path.splitext(file_name)[0]
+    if name == "__init__":
+        return os.path.basename(directory)
+    return name
+
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class Document(object):
+    """
+    Editor buffer, kept in sync with "open" and "change" requests, so that
+    requests don't need to carry the whole source.
+    """
+    _revisions = count()    # unique across documents, unlike versions
+
+    def __init__(self, path, source, version):
+        self.path = path
+        self.version = version
+        self.revision = next(self._revisions)
+        self.lines = split_lines(source, keepends=True)
+        self._source = source
+        self._parsed_lines = None   # lines of the last parse
+        self._changed_ranges = []   # changed since then, for diff parser
+        self._tokenizer = None      # tokens of the parsed lines, after edits
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = "".join(self.lines)
+        return self._source
+
+    def apply(self, change):
+        """
+        Applies CodeMirror-like change: text between "from" and "to"
+        positions is replaced with "text", given as a list of lines.
+        """
+        start, end = change["from"], change["to"]
+        head = self.lines[start["line"]][:start["ch"]]
+        tail = self.lines[end["line"]][end["ch"]:]
+        lines = split_lines(head + "\n".join(change["text"]) + tail,
+                            keepends=True)
+        if tail and lines[-1] == "":
+            # tail ends with a line break, which is not an extra line here
+            lines.pop()
+        self._track_change(start["line"], end["line"] + 1, len(lines))
+        # New list every time: parser cache compares lines by identity.
+        self.lines = self.lines[:start["line"]] + lines + \
+            self.lines[end["line"] + 1:]
+        self.revision = next(self._revisions)
+        self._source = None
+
+    def _track_change(self, start, end, count):
+        """
+        Merges replacement of lines from start to end with count lines into
+        changed ranges, kept as (old_start, old_end, new_start, new_end)
+        tuples relative to the last parsed lines.
+        """
+        before, merged, after = [], [], []
+        for changed in self._changed_ranges:
+            if changed[3] < start:
+                before.append(changed)
+            elif changed[2] > end:
+                after.append(changed)
+            else:
+                merged.append(changed)
+
+        def shift(ranges):
+            return sum((j2 - j1) - (i2 - i1) for i1, i2, j1, j2 in ranges)
+
+        new_start = min([start] + [changed[2] for changed in merged])
+        new_end = max([end] + [changed[3] for changed in merged])
+        delta = count - (end - start)
+        self._changed_ranges = before + [(
+            new_start - shift(before),
+            new_end - shift(before) - shift(merged),
+            new_start,
+            new_end + delta
+        )] + [(i1, i2, j1 + delta, j2 + delta) for i1, i2, j1, j2 in after]
+
+    def parse(self, grammar):
+        """
+        Brings document's tree in parser cache up to date by feeding it
+        straight to diff parser, so that Jedi finds the tree ready instead of
+        parsing the source again. Returns the tree.
+        """
+        path = os.path.abspath(self.path)
+        item = parser_cache.get(grammar._hashed, {}).get(path)
+        if item is None:
+            module = grammar.parse(self.source, path=path, diff_cache=True)
+            self.lines = parser_cache[grammar._hashed][path].lines
+        elif item.lines is not self.lines:
+            # Changed lines are known, unless the tree in cache has been
+            # parsed from something else in the meantime.
+            known = item.lines is self._parsed_lines
+            changed_ranges = self._changed_ranges if known else None
+            # Only lines, that have changed, are tokenized again, starting in
+            # the tokenizer state saved at them.
+            tokenizer = self._tokenizer
+            if tokenizer is None or tokenizer.lines is not item.lines:
+                tokenizer = IncrementalTokenizer(grammar.version_info,
+                                                 item.lines)
+            tokenizer.update(self.lines, changed_ranges)
+            self._tokenizer = tokenizer
+            module = DiffParser(
+                grammar._pgen_grammar, grammar._tokenizer, item.node,
+                tokenizer
+            ).update(
+                old_lines=item.lines,
+                new_lines=self.lines,
+                changed_ranges=changed_ranges
+            )
+            save_module(grammar._hashed, path, module, self.lines,
+                        pickling=False)
+        else:
+            module = item.node
+        self._parsed_lines = self.lines
+        self._changed_ranges = []
+        return module
+
+
+class Session(object):
+    """
+    Long-lived Jedi evaluator shared by all requests. Imported modules and
+    inference results are kept between requests and are dropped per module,
+    together with modules importing it, as soon as the module's file (or
+    editor buffer) changes.
+    """
+    def __init__(self):
+        self._evaluator = None
+        self._buffers = {}  # buffer path -> last known revision or hash
+        self._stamps = {}   # module path -> (mtime, hash) of the parsed code
+        self._evicted = []  # (path, tree) evicted from parser cache since
+        self._checked = 0   # time of the last check of files on disk
+        parser_cache.on_evict = self._on_evict
+
+    @property
+    def evaluator(self):
+        if self._evaluator is None:
+            self._evaluator = Evaluator(parso.load_grammar(), Project())
+        return self._evaluator
+
+    def script(self, source, line, column, path, revision=None,
+               check_files=True):
+        """
+        Returns Script using the session evaluator. Requests looking at many
+        files call invalidate once instead and skip checking files on disk.
+        """
+        changed = self._changed_buffer(source, path, revision)
+        if check_files:
+            changed.update(self._changed_files(path))
+        self._forget(changed)
+        return jedi.api.Script(
+            source=source,
+            line=line,
+            column=column,
+            path=path,
+            evaluator=self.evaluator
+        )
+
+    def _on_evict(self, path, item):
+        # Evaluator still holds the tree, it's dropped on next request.
+        self._evicted.append((path, item.node))
+        self._stamps.pop(path, None)
+
+    def _cached_item(self, path):
+        return parser_cache.get(self.evaluator.grammar._hashed, {}).get(path)
+
+    def invalidate(self):
+        """
+        Makes evaluator forget modules changed on disk, see _changed_files.
+        """
+        self._forget(self._changed_files())
+
+    def _changed_buffer(self, source, path, revision=None):
+        """
+        Returns {path: tree} of the buffer, if it has changed since the last
+        request. Buffers are compared by document revision or content hash.
+        """
+        path = os.path.abspath(path) if path else None
+        digest = hash_source(source) if revision is None else revision
+        changed = {}
+        if self._buffers.get(path, digest) != digest:
+            item = self._cached_item(path)
+            if item is not None:
+                changed[path] = item.node
+        self._buffers[path] = digest
+        return changed
+
+    def _changed_files(self, skip=None):
+        """
+        Returns {path: tree} of loaded modules changed on disk, compared by
+        mtime first and by content hash only if mtime differs. Files are
+        checked at most every SESSION_CHECK_INTERVAL seconds.
+        """
+        skip = os.path.abspath(skip) if skip else None
+        changed, self._evicted = dict(self._evicted), []
+        now = time.time()
+        if now - self._checked < SESSION_CHECK_INTERVAL:
+            return changed
+        self._checked = now
+
+        for module in set(self.evaluator.modules.values()):
+            if not isinstance(module, ModuleContext):
+                continue
+            module_path = module.py__file__()
+            if module_path is None or module_path == skip:
+                continue
+            known = self._stamps.get(module_path)
+            if known is None:
+                # Stamp the module with the code it was actually parsed from.
+                item = self._cached_item(module_path)
+                if item is None:
+                    continue
+                known = (item.change_time, hash_source("".join(item.lines)))
+                self._stamps[module_path] = known
+            mtime = file_mtime(module_path)
+            if mtime == known[0]:
+                continue
+            digest = hash_file(module_path)
+            if digest is None or digest != known[1]:
+                changed[module_path] = module.tree_node
+                del self._stamps[module_path]
+            else:
+                self._stamps[module_path] = mtime, digest
+        return changed
+
+    def _forget(self, changed):
+        """
+        Makes evaluator forget changed modules and the modules, that import
+        them directly or not. Imports are told by the names modules use, so
+        a module using a name like the changed module's one is forgotten too,
+        but none importing it is missed.
+        """
+        if not changed:
+            return
+        stale = set(changed.values())
+        names = set(module_name(path) for path in changed if path)
+        modules = [module for module in set(self.evaluator.modules.values())
+                   if isinstance(module, ModuleContext) and
+                   module.tree_node not in stale]
+        while names:
+            used_by = []
+            for module in modules:
+                used_names = module.tree_node.get_used_names()
+                if any(name in used_names for name in names):
+                    used_by.append(module)
+            modules = [module for module in modules if module not in used_by]
+            stale.update(module.tree_node for module in used_by)
+            names = set(module_name(module.py__file__()) for module in used_by
+                        if module.py__file__())
+        self.evaluator.forget_modules(stale)
+
+
+def cancelled_response(request_id):
+    return {
+        "id": request_id,
+        "status": "CANCELLED"
+    }
+
+
+class Flake8Linter(object):
+    """
+    Runs flake8 on buffer contents inside the process. Flake8 and its
+    plugins are imported on first use and the set up application is kept
+    for every combination of settings, so a check costs only the checks
+    themselves. Results are cached by content hash and settings.
+
+    Flake8 3.8 and newer have no API for that, they are run as ``flake8 -``
+    in a separate process, with the buffer contents on stdin.
+    """
+    def __init__(self):
+        self._applications = {}     # (max line length, ignore) -> app
+        self._checker_class = None
+        self._in_process = None     # unknown until flake8 is imported
+        self.results = LRUCache(LINT_CACHE_SIZE)
+
+    def _load(self):
+        try:
+            import flake8
+        except ImportError:
+            raise Flake8UnavailableError("Flake8 unawailable")
+        if int(flake8.__version__.split(".")[0]) < 3:
+            raise Flake8UnavailableError(
+                "Flake8 %s is not supported" % flake8.__version__)
+        try:
+            from flake8 import checker, processor
+            from flake8.formatting.base import BaseFormatter
+            from flake8.main.application import Application
+        except ImportError:
+            Application = None
+        self._in_process = Application is not None and all(
+            hasattr(Application, name) for name in FLAKE8_APPLICATION_METHODS)
+        if not self._in_process:
+            return
+
+        class BufferChecker(checker.FileChecker):
+            """ Checks given lines instead of reading the file """
+            def __init__(self, filename, checks, options, lines):
+                self._lines = lines
+                checker.FileChecker.__init__(self, filename, checks, options)
+
+            def _make_processor(self):
+                return processor.FileProcessor(self.filename, self.options,
+                                               lines=self._lines)
+
+        class CollectingFormatter(BaseFormatter):
+            """ Keeps reported errors instead of writing them out """
+            def after_init(self):
+                self.errors = []
+
+            def handle(self, error):
+                self.errors.append(error)
+
+        self._checker_class = BufferChecker
+        self._application_class = Application
+        self._formatter_class = CollectingFormatter
+
+    def _application(self, max_line_length, ignore):
+        key = (max_line_length, ignore)
+        application = self._applications.get(key)
+        if application is None:
+            argv = ["--max-line-length=%d" % max_line_length]
+            if ignore:
+                argv.append("--ignore=" + ",".join(ignore))
+            application = self._application_class()
+            application.parse_preliminary_options_and_args(argv)
+            application.make_config_finder()
+            application.find_plugins()
+            application.register_plugin_options()
+            application.parse_configuration_and_cli(argv)
+            application.make_formatter(self._formatter_class)
+            application.make_notifier()
+            application.make_guide()
+            self._applications[key] = application
+        return application
+
+    def check(self, path, source, max_line_length, ignore):
+        """
+        Returns flake8 errors of source, as if it was the file at path.
+        """
+        ignore = tuple(ignore)
+        key = (hash_source(source), max_line_length, ignore)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        if self._in_process is None:
+            self._load()
+        if self._in_process:
+            result = self._check(path, source, max_line_length, ignore)
+        else:
+            result = self._run(path, source, max_line_length, ignore)
+        self.results[key] = result
+        return result
+
+    def _check(self, path, source, max_line_length, ignore):
+        application = self._application(max_line_length, ignore)
+        file_checker = self._checker_class(
+            path, application.check_plugins.to_dictionary(),
+            application.options, source.splitlines(True))
+        filename, results, _ = file_checker.run_checks()
+
+        application.formatter.errors = []
+        for code, row, column, text, physical_line in results:
+            application.guide.handle_error(code, filename, row, column, text,
+                                           physical_line)
+        return [{
+            "row":    error.line_number,
+            "column": error.column_number,
+            "code":   error.code,
+            "text":   error.text
+        } for error in sorted(application.formatter.errors,
+                              key=lambda error: (error.line_number,
+                                                 error.column_number))]
+
+    def _run(self, path, source, max_line_length, ignore):
+        command = [sys.executable, "-m", "flake8",
+                   "--max-line-length=%d" % max_line_length,
+                   "--format=" + FLAKE8_FORMAT,
+                   "--stdin-display-name=" + path, "-"]
+        if ignore:
+            command.append("--ignore=" + ",".join(ignore))
+        process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        output, errors = process.communicate(source.encode("utf-8"))
+        # Flake8 exits with 1, if it has found errors.
+        if process.returncode not in (0, 1):
+            raise PythonToolsError(
+                "Flake8 failed: " + errors.decode("utf-8", "replace"))
+        result = []
+        for line in output.decode("utf-8", "replace").splitlines():
+            match = FLAKE8_OUTPUT_REGEX.match(line)
+            if match is not None:
+                row, column, code, text = match.groups()
+                result.append({
+                    "row":    int(row),
+                    "column": int(column),
+                    "code":   code,
+                    "text":   text
+                })
+        result.sort(key=lambda error: (error["row"], error["column"]))
+        return result
+
+
 class PythonTools:
     def __init__(self):
         self.settings = {}
+        self.session = None
+        self.is_cancelled = None    # checked while evaluating requests
+        self.documents = {}         # open editor buffers by path
+        self.resolved = LRUCache(RESOLVE_CACHE_SIZE)
+        self.last_completions = None    # (buffer key, completions by name)
+        self.completion_cache = None    # see _refine_completions
+        self.max_completions = DEFAULT_MAX_COMPLETIONS
+        self.linted = LRUCache(LINT_CACHE_SIZE)
+        self.flake8 = Flake8Linter()
 
     def input(self):
         """
-        Input single line from stdin as JSON, deserializes it and returns
+        Input single message from stdin, deserializes it and returns
         request object.
         """
-        return loads(sys.stdin.readline())
+        return read_message(binary_stream(sys.stdin))
 
     def output(self, response):
         """
-        Serializes JSON response and writes it to a stdout.
+        Serializes response and writes it to a stdout.
         """
-        sys.stdout.write(dumps(response))
-        sys.stdout.write("\n")
+        write_message(binary_stream(sys.stdout), response)
 
     def process(self, request):
         """
@@ -90,8 +793,19 @@ class PythonTools:
             "goto": self.goto_definition,
             "docs": self.get_documentation,
             "setup": self.setup,
+            "open": self.open_document,
+            "change": self.change_document,
+            "close": self.close_document,
             "paramter_hint": self.parameter_hint,
-            "autocomplete": self.autocomplete
+            "autocomplete": self.autocomplete,
+            "resolve": self.resolve,
+            "lint": self.lint,
+            "flake8": self.run_flake8,
+            "warm_up": self.warm_up,
+            "usages": self.usages,
+            "usages_in": self.usages_in,
+            "symbols": self.symbols,
+            "stats": self.stats
         }
         processor = dispatches.get(request.get("type", None), None)
         try:
@@ -99,28 +813,90 @@ class PythonTools:
                 raise PythonToolsError('Unknown command "%s"' % request["type"])
             else:
                 return {
+                    "id": request.get("id"),
                     "status": "OK",
                     "content": processor(request)
                 }
+        except Cancelled:
+            return cancelled_response(request.get("id"))
         except Exception as E:
-            return {
-                "status": "ERROR",
-                "error": {
-                    "name": E.__class__.__name__,
-                    "value": str(E),
-                    "traceback": format_tb(sys.exc_info()[2])
-                }
-            }
+            return error_response(E, request.get("id"))
+
+    def _document_from_request(self, request):
+        """
+        Returns the open document of the request, or None if the request
+        carries its source itself.
+        """
+        if "source" in request:
+            return None
+        try:
+            document = self.documents[request["path"]]
+        except KeyError:
+            raise PythonToolsError('Document "%s" is not open' % request["path"])
+        if request.get("version", document.version) != document.version:
+            raise Cancelled  # document has changed since, result is obsolete
+        return document
+
+    def _buffer_key(self, request):
+        """
+        Identifies the buffer state and position a request was made for.
+        """
+        document = self._document_from_request(request)
+        if document is None:
+            revision = hash_source(request["source"])
+        else:
+            revision = document.revision
+        return request["path"], revision, request["line"], request["column"]
 
-    def _script_from_request(self, request):
+    def _script_from_request(self, request, check_files=True):
         if not WITH_JEDI:
             raise PythonToolsError("Jedi unawailable")
-        return jedi.api.Script(
-            source=request["source"],
-            line=request["line"] + 1,       # Jedi starts line count with 1
-            column=request["column"],
-            path=request["path"]
-        )
+        document = self._document_from_request(request)
+        if document is None:
+            source, revision = request["source"], None
+        else:
+            source, revision = document.source, document.revision
+
+        if self.session is not None:
+            script = self.session.script(
+                source=source,
+                line=request["line"] + 1,   # Jedi starts line count with 1
+                column=request["column"],
+                path=request["path"],
+                revision=revision,
+                check_files=check_files
+            )
+        else:
+            script = jedi.api.Script(
+                source=source,
+                line=request["line"] + 1,   # Jedi starts line count with 1
+                column=request["column"],
+                path=request["path"]
+            )
+        if document is not None:
+            document.parse(script._grammar)
+        script._evaluator.is_cancelled = self.is_cancelled
+        return script
+
+    def open_document(self, request):
+        self.documents[request["path"]] = Document(
+            request["path"], request["source"], request["version"])
+        if WITH_JEDI:
+            path = os.path.abspath(request["path"])
+            parser_cache.pin(path)
+            # Dynamic param search looks for calls in the same directory.
+            get_identifier_index().index_in_background(os.path.dirname(path))
+
+    def change_document(self, request):
+        document = self.documents[request["path"]]
+        for change in request["changes"]:
+            document.apply(change)
+        document.version = request["version"]
+
+    def close_document(self, request):
+        self.documents.pop(request["path"], None)
+        if WITH_JEDI:
+            parser_cache.unpin(os.path.abspath(request["path"]))
 
     def setup(self, request):
         """
@@ -131,32 +907,259 @@ class PythonTools:
         if WITH_JEDI:
             jedi.settings.case_insensitive_completion = \
                 not settings["is_case_sensitive"]
+            self.max_completions = settings.get("max_completions",
+                                                DEFAULT_MAX_COMPLETIONS)
+            parser_cache.set_limits(
+                max_items=settings.get("parser_cache_items",
+                                       PARSER_CACHE_ITEMS),
+                max_size=settings.get("parser_cache_size", PARSER_CACHE_SIZE)
+            )
+            parso.cache.content_addressed = settings.get("content_cache", True)
+            jedi.settings.compact_trees = settings.get("compact_trees", True)
+            if settings.get("persistent_session", True):
+                if self.session is None:
+                    self.session = Session()
+            else:
+                self.session = None
 
         return {
             "with_jedi": WITH_JEDI,
             "with_docutils": WITH_DOCUTILS
         }
 
+    def stats(self, request):
+        """
+        Returns cache statistics of this process.
+        """
+        stats = {"pid": os.getpid(), "documents": len(self.documents)}
+        if WITH_JEDI:
+            stats["parser_cache"] = parser_cache.stats()
+            # Asking the session for its evaluator would create one.
+            if self.session is not None and \
+                    self.session._evaluator is not None:
+                stats["modules"] = len(self.session._evaluator.modules)
+        return stats
+
+    def warm_up(self, request):
+        """
+        Does one step of warm up, so that the first real request doesn't
+        pay for loading grammars, builtins and heavy modules.
+        """
+        if not WITH_JEDI:
+            return None
+        step = request["step"]
+        if step == "grammar":
+            parso.load_grammar()
+            parso.load_grammar(version="3.6")   # loaded by Jedi evaluator
+            if self.session is not None:
+                self.session.evaluator
+            return None
+
+        source = WARM_UP_SOURCES[step]
+        if step == "module":
+            source = source % request["module"]
+        # same as jedi.preload_module, but warms up the session, if any
+        jedi.api.Script(
+            source, 1, len(source), None,
+            evaluator=self.session and self.session.evaluator
+        ).completions()
+        return None
+
+    def _request_lines(self, request):
+        document = self._document_from_request(request)
+        if document is None:
+            return split_lines(request["source"], keepends=True)
+        return document.lines
+
+    def _refine_completions(self, request, lines, prefix):
+        """
+        If the user has only typed more characters of the name completed by
+        the previous request, its completions are filtered by the longer
+        prefix instead of running Jedi again. Returns None otherwise.
+        Completions are (jedi completion, text to complete, rank) triples.
+        """
+        if self.completion_cache is None:
+            return None
+        path, old_lines, line, start, old_prefix, completions = \
+            self.completion_cache
+        if path != request["path"] or line != request["line"] or \
+                start != request["column"] - len(prefix) or \
+                not prefix.startswith(old_prefix) or \
+                len(lines) != len(old_lines):
+            return None
+
+        # Everything but the name being typed must be the same. Unchanged
+        # lines of a document are the same objects, so this is cheap.
+        new_line, old_line = lines[line], old_lines[line]
+        if new_line[:start] != old_line[:start] or \
+                new_line[start + len(prefix):] != \
+                old_line[start + len(old_prefix):] or \
+                lines[:line] != old_lines[:line] or \
+                lines[line + 1:] != old_lines[line + 1:]:
+            return None
+
+        typed = len(prefix) - len(old_prefix)
+        if jedi.settings.case_insensitive_completion:
+            prefix = prefix.lower()
+            return [(completion, complete[typed:], rank)
+                    for completion, complete, rank in completions
+                    if completion.name.lower().startswith(prefix)]
+        return [(completion, complete[typed:], rank)
+                for completion, complete, rank in completions
+                if completion.name.startswith(prefix)]
+
+    def _rank_completions(self, script, completions):
+        """
+        Returns (jedi completion, text to complete, rank) triples, where
+        rank doesn't depend on the typed prefix, so it survives refinement.
+        """
+        module_node = script._get_module_node()
+        used_names = module_node.get_used_names()
+        return [(
+            completion,
+            completion.complete,
+            (completion_scope_rank(completion, module_node),
+             -len(used_names.get(completion.name, ())))
+        ) for completion in completions]
+
     def autocomplete(self, request):
-        script = self._script_from_request(request)
-        completions = []
-        for completion in script.completions():
-            docstring = completion.docstring(raw=True, fast=True)
-            if completion.type == "keyword":
-                continue
-            completions.append({
-                "complete":    completion.complete,
-                "name":        completion.name,
-                "type":        completion.type,
-                "description": completion.description,
-                "docstring":   docstring
-            })
-        # TODO: sort completions here!
-        return completions
+        """
+        Returns completions without docstrings, those are fetched for a
+        single completion on demand by "resolve" request.
+        Only the best "max_completions" ones are returned, ranked by how
+        well they match the prefix, where they are defined and how often
+        they are used in the current module.
+        """
+        lines = self._request_lines(request)
+        prefix = NAME_PREFIX_REGEX.search(
+            lines[request["line"]][:request["column"]]).group()
+
+        completions = self._refine_completions(request, lines, prefix)
+        if completions is None:
+            script = self._script_from_request(request)
+            completions = self._rank_completions(script, [
+                completion for completion in script.completions()
+                if completion.type != "keyword"
+            ])
+        self.completion_cache = (request["path"], lines, request["line"],
+                                 request["column"] - len(prefix), prefix,
+                                 completions)
+        self.last_completions = (
+            self._buffer_key(request),
+            dict((completion.name, completion)
+                 for completion, _, _ in completions)
+        )
+
+        def key(item):
+            completion, _, rank = item
+            return (prefix_match_rank(completion.name, prefix),) + rank + \
+                (completion.name.lower(),)
+
+        if self.max_completions:
+            completions = nsmallest(self.max_completions, completions, key)
+        else:
+            completions = sorted(completions, key=key)
+        return [{
+            "complete":    complete,
+            "name":        completion.name,
+            "type":        completion.type,
+            "description": completion.description
+        } for completion, complete, _ in completions]
+
+    def resolve(self, request):
+        """
+        Returns docstring and details of a single completion, given by
+        "name", for the same buffer and position as "autocomplete".
+        """
+        buffer_key = self._buffer_key(request)
+        key = buffer_key + (request["name"], )
+        details = self.resolved.get(key)
+        if details is not None:
+            return details
+
+        if self.last_completions is not None and \
+                self.last_completions[0] == buffer_key:
+            completions = self.last_completions[1]
+        else:
+            script = self._script_from_request(request)
+            completions = dict((completion.name, completion)
+                               for completion in script.completions())
+        try:
+            completion = completions[request["name"]]
+        except KeyError:
+            raise PythonToolsError('No completion "%s"' % request["name"])
+
+        details = {
+            "name":        completion.name,
+            "type":        completion.type,
+            "description": completion.description,
+            "docstring":   completion.docstring(raw=True, fast=True),
+            "full_name":   completion.full_name,
+            "module_name": completion.module_name
+        }
+        self.resolved[key] = details
+        return details
 
     def format_title(self, title):
         return TRIM_REGEX.sub("", title)
 
+    def lint(self, request):
+        """
+        Checks code style and syntax of a document with parso's normalizers,
+        reusing the tree already parsed for other requests. Returns issues
+        in the same format as flake8 output, with 1-based rows and columns.
+        """
+        if not WITH_JEDI:
+            raise PythonToolsError("Parso unawailable")
+        if self.session is not None:
+            grammar = self.session.evaluator.grammar
+        else:
+            grammar = parso.load_grammar()
+        ignored = tuple(request.get("ignore") or LINT_DEFAULT_IGNORE)
+        max_line_length = request.get("max_line_length", 79)
+
+        document = self._document_from_request(request)
+        if document is None:
+            key = None
+            module = grammar.parse(request["source"], cache=False)
+        else:
+            key = (document.path, document.revision, max_line_length, ignored)
+            result = self.linted.get(key)
+            if result is not None:
+                return result
+            module = document.parse(grammar)
+
+        config = PEP8NormalizerConfig(max_characters=max_line_length)
+        issues = sorted(grammar._get_normalizer_issues(module, config),
+                        key=lambda issue: issue.start_pos)
+        result = []
+        for issue in issues:
+            code = lint_code(issue.code)
+            if issue.code in LINT_UNFINISHED or code.startswith(ignored):
+                continue
+            result.append({
+                "row":    issue.start_pos[0],
+                "column": issue.start_pos[1] + 1,
+                "code":   code,
+                "text":   issue.message
+            })
+        if key is not None:
+            self.linted[key] = result
+        return result
+
+    def run_flake8(self, request):
+        """
+        Checks a document with flake8, for checks parso doesn't have.
+        """
+        document = self._document_from_request(request)
+        if document is None:
+            source = request["source"]
+        else:
+            source = document.source
+        return self.flake8.check(request["path"], source,
+                                 request.get("max_line_length", 79),
+                                 request.get("ignore") or ())
+
     def get_documentation(self, request):
         script = self._script_from_request(request)
 
@@ -207,6 +1210,132 @@ class PythonTools:
             "success": True
         }
 
+    def usages(self, request):
+        """
+        Finds usages of the name under the cursor in Python files under the
+        "root" directory (the file's directory by default). The name is
+        resolved and searched in the current file here, other files are
+        searched in chunks of directories by "usages_in" requests. Worker
+        pool asks for the chunks with "split" and spreads them across
+        workers, otherwise they are searched here too.
+        """
+        script = self._script_from_request(request)
+        tree_name = script._get_module_node().get_name_of_position(script._pos)
+        if tree_name is None:
+            return {"name": None, "usages": [], "definitions": [], "chunks": []}
+
+        module = script._get_module()
+        definitions = set(usage_key(name)
+                          for name in find_definitions(module, tree_name))
+        path = os.path.abspath(request["path"])
+        usages = [
+            {"path": path, "line": name_leaf.line, "column": name_leaf.column}
+            for name_leaf in find_usages_in_module(
+                module, tree_name.value,
+                lambda definition: usage_key(definition) in definitions)
+        ]
+        chunks = self._usages_chunks(
+            os.path.abspath(request.get("root") or os.path.dirname(path)))
+        if not request.get("split", False):
+            for directories in chunks:
+                usages.extend(self.usages_in({
+                    "name": tree_name.value,
+                    "definitions": definitions,
+                    "directories": directories,
+                    "skip": path
+                }))
+            chunks = []
+        return {
+            "name": tree_name.value,
+            "usages": usages,
+            "definitions": list(definitions),
+            "chunks": chunks
+        }
+
+    def _usages_chunks(self, root):
+        """
+        Splits directories with Python files under root into chunks of about
+        USAGES_CHUNK_FILES files.
+        """
+        chunks, chunk, files = [], [], 0
+        for directory, dir_names, file_names in os.walk(root):
+            dir_names[:] = sorted(name for name in dir_names
+                                  if not name.startswith(".") and
+                                  name != "__pycache__")
+            count = len([name for name in file_names if name.endswith(".py")])
+            if count:
+                chunk.append(directory)
+                files += count
+            if files >= USAGES_CHUNK_FILES:
+                chunks.append(chunk)
+                chunk, files = [], 0
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def usages_in(self, request):
+        """
+        Finds usages of "name" in Python files of "directories", except the
+        "skip" file. Only files using the name according to the identifier
+        index, and open documents, are searched. Names are matched by their
+        definitions, see usage_key.
+        """
+        if not WITH_JEDI:
+            raise PythonToolsError("Jedi unawailable")
+        name = request["name"]
+        definitions = set(tuple(key) for key in request["definitions"])
+        index = get_identifier_index()
+        if self.session is not None:
+            self.session.invalidate()
+        usages = []
+        for directory in request["directories"]:
+            paths = set(index.get_files_containing(directory, name))
+            paths.update(path for path in self.documents
+                         if os.path.dirname(path) == directory)
+            paths.discard(request.get("skip"))
+            for path in sorted(paths):
+                if self.is_cancelled is not None and self.is_cancelled():
+                    raise Cancelled
+                file_request = {"path": path, "line": 0, "column": 0}
+                if path not in self.documents:
+                    try:
+                        with open(path, "rb") as f:
+                            file_request["source"] = python_bytes_to_unicode(
+                                f.read(), errors="replace")
+                    except (IOError, OSError, LookupError):
+                        continue    # gone or has unknown encoding
+                script = self._script_from_request(file_request,
+                                                   check_files=False)
+                usages.extend(
+                    {"path": path, "line": name_leaf.line,
+                     "column": name_leaf.column}
+                    for name_leaf in find_usages_in_module(
+                        script._get_module(), name,
+                        lambda definition: usage_key(definition) in definitions)
+                )
+        return usages
+
+    def symbols(self, request):
+        """
+        Finds classes and functions by name under the "root" directory (or
+        the directory of "path"), matching "query" fuzzily.
+        """
+        if not WITH_JEDI:
+            raise PythonToolsError("Jedi unawailable")
+        query = request["query"].strip()
+        root = os.path.abspath(
+            request.get("root") or os.path.dirname(request["path"]))
+        found = get_symbol_index().find(
+            root, query, request.get("limit", DEFAULT_MAX_SYMBOLS))
+        return [{
+            "name":      name,
+            "kind":      kind,
+            "path":      path,
+            "line":      line,
+            "column":    column,
+            "container": container
+        } for name, kind, path, line, column, container in found]
+
     def parameter_hint(self, request):
         # it looks like parameter hinting is not a part of standart Brackets API
         raise NotImplemented
@@ -217,10 +1346,496 @@ class PythonTools:
         """
         while True:
             request = self.input()
+            if request is None:
+                break
             response = self.process(request)
             self.output(response)
 
 
-if __name__ == "__main__":
+def serve_worker(connection, cancelled):
+    """
+    Entry point of a worker process: processes requests coming through
+    the connection one by one and sends responses back. ``cancelled`` is
+    a shared value holding the id of a request cancelled by the pool.
+    """
+    # Only the pool writes frames to stdout, stray output of the worker,
+    # e.g. prints of analyzed code, goes to stderr instead.
+    sys.stdout.flush()
+    os.dup2(2, 1)
     python_tools = PythonTools()
-    python_tools.watch()
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            request_id = request.get("id")
+            python_tools.is_cancelled = lambda: cancelled.value == request_id
+            if request_id is not None and cancelled.value == request_id:
+                response = cancelled_response(request_id)
+            else:
+                response = python_tools.process(request)
+            connection.send(response)
+    finally:
+        # Workers exit with os._exit, that doesn't run atexit handlers.
+        if WITH_JEDI:
+            close_module_stores()
+
+
+class Worker(object):
+    """
+    A worker process with its own PythonTools instance, a thread listening
+    for its responses and a thread sending requests to it.
+    """
+    def __init__(self, events):
+        self.pending = []   # (request, is forwarded) in order of sending
+        self.warm_up = []   # warm up steps left to do
+        self.last_path = None
+        self.cancelled = Value("l", 0, lock=False)
+        self.outgoing = Queue()     # requests waiting to be sent
+        self.connection, child_connection = Pipe()
+        self.process = Process(target=serve_worker,
+                               args=(child_connection, self.cancelled))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+
+        listener = Thread(target=self.listen, args=(events,))
+        listener.daemon = True
+        listener.start()
+        sender = Thread(target=self.send_requests)
+        sender.daemon = True
+        sender.start()
+
+    @property
+    def busy(self):
+        return len(self.pending) > 0
+
+    def listen(self, events):
+        while True:
+            try:
+                response = self.connection.recv()
+            except (EOFError, IOError, OSError):
+                events.put(("died", self))
+                return
+            events.put(("response", (self, response)))
+
+    def send_requests(self):
+        """
+        Sends requests in order. Sending blocks, while a busy worker doesn't
+        read a request bigger than the pipe's buffer, e.g. a document
+        broadcast by the pool, so it's done in a thread of its own.
+        """
+        while True:
+            request = self.outgoing.get()
+            try:
+                self.connection.send(request)
+            except (IOError, OSError):
+                return  # the listener reports the death
+            if request is None:
+                return
+
+    def send(self, request, forward=True):
+        self.pending.append((request, forward))
+        if forward:
+            self.last_path = request.get("path", self.last_path)
+        self.outgoing.put(request)
+
+    def cancel(self, request_id):
+        """
+        Cancels request if it is handled by this worker.
+        """
+        for request, forward in self.pending:
+            if forward and request.get("id") == request_id:
+                self.cancelled.value = request_id
+                return True
+        return False
+
+    def stop(self):
+        self.outgoing.put(None)
+
+
+class WorkerPool:
+    """
+    Reads requests from stdin and dispatches them to a pool of worker
+    processes, so that a slow request does not block the ones behind it.
+    Responses are written as soon as they are ready and may come out of
+    order; requests and responses are matched by their "id".
+    """
+    def __init__(self, size=DEFAULT_WORKERS):
+        self.events = Queue()
+        self.workers = []
+        self.queue = []             # requests waiting for an idle worker
+        self.setup_request = None   # last setup, replayed to new workers
+        self.warm_up_steps = []     # done by every worker after setup
+        self.warm_up_left = 0       # steps to be done before "ready" event
+        self.warm_up_setups = count(1)  # tells reported steps of setups apart
+        self.warm_up_setup = 0
+        self.collected = {}         # request id -> responses of every worker
+        self.searches = {}          # request id -> running usages search
+        self.documents = {}         # open documents, replayed to new workers
+        self.compression_threshold = 0
+        self.stdin = detached_stdin()
+        self.stdout = binary_stream(sys.stdout)
+        self.resize(size)
+
+    def resize(self, size):
+        size = max(1, size)
+        while len(self.workers) > size:
+            self.workers.pop().stop()
+        while len(self.workers) < size:
+            self.workers.append(self.spawn())
+
+    def spawn(self):
+        worker = Worker(self.events)
+        if self.setup_request is not None:
+            worker.send(self.setup_request, forward=False)
+            worker.warm_up = list(self.warm_up_steps)
+        for document in self.documents.values():
+            worker.send({
+                "type": "open",
+                "path": document.path,
+                "source": document.source,
+                "version": document.version
+            }, forward=False)
+        return worker
+
+    def read_input(self):
+        """
+        Reads messages from stdin in a separate thread.
+        """
+        while True:
+            try:
+                request = read_message(self.stdin)
+            except PythonToolsError as E:
+                # framing is broken, there is no way to find next message
+                self.events.put(("invalid", E))
+                break
+            except (ValueError, zlib.error) as E:
+                self.events.put(("invalid", E))
+                continue
+            if request is None:
+                break
+            self.events.put(("request", request))
+        self.events.put(("exit", None))
+
+    def output(self, response):
+        """
+        Serializes response and writes it to a stdout.
+        """
+        write_message(self.stdout, response, self.compression_threshold)
+
+    def setup(self, request):
+        """
+        Resizes the pool and broadcasts setup to every worker; only the
+        first worker's response is forwarded.
+        """
+        self.setup_request = request
+        self.compression_threshold = \
+            request["settings"].get("compression_threshold", 0)
+        self.resize(request["settings"].get("workers", DEFAULT_WORKERS))
+        for index, worker in enumerate(self.workers):
+            worker.send(request, forward=index == 0)
+
+        self.warm_up_steps = []
+        if request["settings"].get("warm_up", False):
+            self.warm_up_steps = [
+                {"type": "warm_up", "step": step} for step in WARM_UP_STEPS
+            ] + [
+                {"type": "warm_up", "step": "module", "module": module}
+                for module in request["settings"].get("preload_modules", [])
+            ]
+        self.warm_up_setup = next(self.warm_up_setups)
+        for worker in self.workers:
+            worker.warm_up = [dict(step, report=self.warm_up_setup)
+                              for step in self.warm_up_steps]
+        self.warm_up_left = len(self.warm_up_steps) * len(self.workers)
+        if self.warm_up_steps:
+            self.report_warm_up(None)
+
+    def collect(self, request):
+        """
+        Broadcasts request to every worker, their responses, or errors,
+        are sent together by handle_collected.
+        """
+        self.collected[request.get("id")] = []
+        for worker in self.workers:
+            worker.send(request, forward=False)
+
+    def handle_collected(self, request, response):
+        responses = self.collected[request.get("id")]
+        responses.append(response)
+        if len(responses) < len(self.workers):
+            return
+        del self.collected[request.get("id")]
+        self.output({
+            "id": request.get("id"),
+            "status": "OK",
+            "content": {
+                "workers": [response["content"]
+                            if response.get("status") == "OK"
+                            else {"error": response.get("error")}
+                            for response in responses]
+            }
+        })
+
+    def report_warm_up(self, step):
+        """
+        Sends warm up progress event, and "ready" event once every worker
+        is warmed up.
+        """
+        total = len(self.warm_up_steps) * len(self.workers)
+        self.output({"event": "warm_up", "content": {
+            "step": step and step.get("module", step["step"]),
+            "done": total - self.warm_up_left,
+            "total": total
+        }})
+        if self.warm_up_left == 0:
+            self.output({"event": "ready", "content": None})
+
+    def sync_document(self, request):
+        """
+        Keeps pool's own copy of documents and broadcasts the request to
+        every worker.
+        """
+        if request["type"] == "open":
+            self.documents[request["path"]] = Document(
+                request["path"], request["source"], request["version"])
+        elif request["type"] == "change":
+            document = self.documents[request["path"]]
+            for change in request["changes"]:
+                document.apply(change)
+            document.version = request["version"]
+        else:
+            self.documents.pop(request["path"], None)
+        for worker in self.workers:
+            worker.send(request, forward=False)
+
+    def cancel(self, request):
+        """
+        Cancels a queued or running request. Either "target" request id or
+        "kind" and "path" of requests to cancel are given.
+        """
+        def matches(other):
+            if "target" in request:
+                return other.get("id") == request["target"]
+            return other.get("type") == request.get("kind") and \
+                other.get("path") == request.get("path")
+        return self.drop(matches)
+
+    def drop(self, matches):
+        """
+        Drops queued requests and interrupts running ones, matching the
+        predicate. Interrupted requests respond on their own.
+        """
+        # Queue is updated first, responding may drop more requests.
+        queued = [request for request in self.queue if matches(request)]
+        self.queue = [request for request in self.queue
+                      if not matches(request)]
+        dropped = len(queued) > 0
+        for request in queued:
+            self.respond(request, cancelled_response(request.get("id")))
+        for worker in self.workers:
+            for running, forward in worker.pending:
+                if forward and matches(running):
+                    dropped = worker.cancel(running.get("id")) or dropped
+        return dropped
+
+    def enqueue(self, request):
+        """
+        Queues request ahead of background requests.
+        """
+        for index, queued in enumerate(self.queue):
+            if queued.get("type") in BACKGROUND_REQUESTS:
+                self.queue.insert(index, request)
+                return
+        self.queue.append(request)
+
+    def supersede(self, request):
+        """
+        Drops older requests of the same kind for the same file.
+        """
+        if request.get("type") in SUPERSEDED_REQUESTS:
+            self.drop(lambda other: other.get("type") == request["type"] and
+                      other.get("path") == request.get("path"))
+
+    def dispatch(self):
+        """
+        Hands queued requests to idle workers, preferring the worker that
+        has handled the same file last, as its session is already warm.
+        """
+        while self.queue:
+            idle = [worker for worker in self.workers if not worker.busy]
+            for index, request in enumerate(self.queue):
+                if request.get("type") in FIRST_WORKER_REQUESTS:
+                    candidates = [worker for worker in idle
+                                  if worker is self.workers[0]]
+                else:
+                    candidates = idle
+                if candidates:
+                    break
+            else:
+                break
+            del self.queue[index]
+            path = request.get("path")
+            warm = [worker for worker in candidates if worker.last_path == path]
+            (warm or candidates)[0].send(request)
+
+        # Warm up goes on step by step, only while there is nothing else to do
+        for worker in self.workers:
+            if worker.warm_up and not worker.busy:
+                worker.send(worker.warm_up.pop(0), forward=False)
+
+    def respond(self, request, response):
+        """
+        Forwards response to a request, unless it is a part of usages search.
+        """
+        if request.get("type") in SEARCH_REQUESTS:
+            self.handle_search(request, response)
+        else:
+            self.output(response)
+
+    def handle_search(self, request, response):
+        """
+        Spreads usages search across workers. Usages are sent in "usages"
+        events as soon as they are found, the response only comes with the
+        name and count of usages, once every chunk is searched.
+        """
+        request_id = request.get("id")
+        if request["type"] == "usages":
+            if response.get("status") != "OK":
+                self.output(response)
+                return
+            content = response["content"]
+            search = self.searches[request_id] = {
+                "name": content["name"],
+                "count": 0,
+                "left": len(content["chunks"]),
+                "failure": None
+            }
+            self.report_usages(request_id, search, content["usages"])
+            for directories in content["chunks"]:
+                self.queue.append({
+                    "id": request_id,
+                    "type": "usages_in",
+                    "name": content["name"],
+                    "definitions": content["definitions"],
+                    "directories": directories,
+                    "skip": os.path.abspath(request["path"])
+                })
+        else:
+            search = self.searches.get(request_id)
+            if search is None:
+                return
+            search["left"] -= 1
+            if response.get("status") == "OK":
+                self.report_usages(request_id, search, response["content"])
+            elif search["failure"] is None:
+                search["failure"] = response
+                # the rest of the search is of no use anymore
+                self.drop(lambda other: other.get("type") == "usages_in" and
+                          other.get("id") == request_id)
+
+        if search["left"] == 0 and \
+                self.searches.pop(request_id, None) is not None:
+            self.output(search["failure"] or {
+                "id": request_id,
+                "status": "OK",
+                "content": {"name": search["name"], "count": search["count"]}
+            })
+
+    def report_usages(self, request_id, search, usages):
+        if usages and search["failure"] is None:
+            search["count"] += len(usages)
+            self.output({"event": "usages", "content": {
+                "id": request_id,
+                "usages": usages
+            }})
+
+    def handle_response(self, worker, response):
+        request, forward = worker.pending.pop(0)
+        if forward:
+            self.respond(request, response)
+        elif request.get("id") in self.collected and \
+                request.get("type") == "stats":
+            self.handle_collected(request, response)
+        elif request.get("report") == self.warm_up_setup:
+            self.warm_up_left -= 1
+            self.report_warm_up(request)
+
+    def handle_death(self, worker):
+        if worker not in self.workers:
+            return  # stopped by resize
+        for request, forward in worker.pending:
+            try:
+                raise PythonToolsError("Worker process died")
+            except PythonToolsError as E:
+                response = error_response(E, request.get("id"))
+            if forward:
+                self.respond(request, response)
+            elif request.get("id") in self.collected and \
+                    request.get("type") == "stats":
+                self.handle_collected(request, response)
+        # its replacement warms up without reporting
+        lost = [step for step in worker.warm_up +
+                [request for request, forward in worker.pending]
+                if step.get("report") == self.warm_up_setup]
+        self.workers[self.workers.index(worker)] = self.spawn()
+        if lost:
+            self.warm_up_left -= len(lost)
+            self.report_warm_up(lost[-1])
+
+    def watch(self):
+        """
+        Wait for input and responses, dispatching them until stdin is closed.
+        """
+        reader = Thread(target=self.read_input)
+        reader.daemon = True
+        reader.start()
+
+        while True:
+            event, payload = self.events.get()
+            if event == "request":
+                if payload.get("type") == "setup":
+                    self.setup(payload)
+                elif payload.get("type") == "cancel":
+                    self.output({
+                        "id": payload.get("id"),
+                        "status": "OK",
+                        "content": self.cancel(payload)
+                    })
+                elif payload.get("type") == "stats":
+                    self.collect(payload)
+                elif payload.get("type") in ("open", "change", "close"):
+                    try:
+                        self.sync_document(payload)
+                        self.output({"id": payload.get("id"), "status": "OK"})
+                    except Exception as E:
+                        self.output(error_response(E, payload.get("id")))
+                else:
+                    self.supersede(payload)
+                    if payload.get("type") == "usages":
+                        payload = dict(payload, split=True)
+                    self.enqueue(payload)
+            elif event == "response":
+                self.handle_response(*payload)
+            elif event == "died":
+                self.handle_death(payload)
+            elif event == "invalid":
+                self.output(error_response(payload))
+            elif event == "exit":
+                break
+            self.dispatch()
+
+        for worker in self.workers:
+            worker.stop()
+        # Daemonic workers would be terminated at exit right away.
+        for worker in self.workers:
+            worker.process.join(WORKER_EXIT_TIMEOUT)
+
+
+if __name__ == "__main__":
+    pool = WorkerPool()
+    pool.watch()
@@ -0,0 +1,162 @@
+"""
+Tests of resuming parso's tokenizer from the state saved at a line, of the
+incremental tokenizer built on that and of the diff parser using its tokens.
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "pythonfiles"))
+
+import parso # noqa
+from parso.python.diff import DiffParser # noqa
+from parso.python.tokenize import tokenize_lines, IncrementalTokenizer # noqa
+from parso.utils import split_lines, parse_version_string # noqa
+
+VERSION = parse_version_string("3.6")
+GRAMMAR = parso.load_grammar(version="3.6")
+
+CODE = u'''\ufeff# comment
+import os
+
+
+class C(object):
+    """
+    Docstring spanning
+    lines.
+    """
+    x = (1,
+         2)  # comment
+
+    def f(self, a=r'\\
+continued', b=[
+            3]):
+        if a:
+            return b \\
+                + 1
+        s = \'\'\'one
+two\'\'\' + "three"
+        # comment
+        return s
+
+
+def g():
+\tpass
+'''
+
+
+def tokenize(lines, **kwargs):
+    return list(tokenize_lines(lines, VERSION, **kwargs))
+
+
+class TokenizerStateTest(unittest.TestCase):
+    def test_resume_at_every_line(self):
+        lines = split_lines(CODE, keepends=True)
+        states = []
+        tokens = tokenize(lines, line_states=states)
+        self.assertEqual(len(states), len(lines))
+        for index, state in enumerate(states):
+            resumed = tokenize(lines, first_line=index, state=state)
+            # The tokens of the line and after it come last.
+            self.assertEqual(tokens[len(tokens) - len(resumed):], resumed,
+                             "resumed at line %s" % (index + 1))
+
+    def test_equal_states_are_shared(self):
+        lines = split_lines(CODE, keepends=True)
+        states = []
+        tokenize(lines, line_states=states)
+        self.assertLess(len(set(map(id, states))), len(states))
+
+
+class IncrementalTokenizerTest(unittest.TestCase):
+    def update(self, tokenizer, code, changed_ranges=None):
+        lines = split_lines(code, keepends=True)
+        tokenizer.update(lines, changed_ranges)
+        self.assertEqual(list(tokenizer.get_tokens()), tokenize(lines))
+
+    def test_changed_line_only(self):
+        tokenizer = IncrementalTokenizer(
+            VERSION, split_lines(CODE, keepends=True))
+        self.update(tokenizer, CODE.replace("if a:", "if a and b:"))
+        self.assertEqual(tokenizer.tokenized_lines, 1)
+
+    def test_inserted_lines(self):
+        tokenizer = IncrementalTokenizer(
+            VERSION, split_lines(CODE, keepends=True))
+        self.update(tokenizer, CODE.replace("import os\n",
+                                            "import os\nimport re\n"))
+        self.assertEqual(tokenizer.tokenized_lines, 1)
+        # Blank lines are in the prefix of the next token.
+        self.update(tokenizer, CODE.replace("import os\n",
+                                            "import os\n\n\nimport re\n"))
+        self.assertEqual(tokenizer.tokenized_lines, 3)
+
+    def test_opened_string(self):
+        tokenizer = IncrementalTokenizer(
+            VERSION, split_lines(CODE, keepends=True))
+        # Everything after an opened string is tokenized again, until it's
+        # closed.
+        code = CODE.replace("import os", 'import os"""')
+        self.update(tokenizer, code)
+        self.assertEqual(tokenizer.tokenized_lines, CODE.count("\n"))
+        self.update(tokenizer, CODE)
+
+    def test_changed_ranges(self):
+        lines = split_lines(CODE, keepends=True)
+        tokenizer = IncrementalTokenizer(VERSION, lines)
+        index = lines.index("        if a:\n")
+        self.update(tokenizer, CODE.replace("        if a:\n", "(\n"),
+                    [(index, index + 1, index, index + 1)])
+
+    def test_random_edits(self):
+        rnd = random.Random(0)
+        snippets = ['"""', "'", "(", ")", "\\\n", "#", "\n", "    ", "\t",
+                    "x = 1\n", "def f():\n"]
+        code = CODE
+        tokenizer = IncrementalTokenizer(
+            VERSION, split_lines(code, keepends=True))
+        for _ in range(300):
+            position = rnd.randrange(len(code) + 1)
+            if rnd.random() < 0.6:
+                code = code[:position] + rnd.choice(snippets) + code[position:]
+            else:
+                code = code[:position] + code[position + rnd.randrange(20):]
+            self.update(tokenizer, code)
+
+
+class DiffParserTest(unittest.TestCase):
+    def dump(self, node):
+        if hasattr(node, "children"):
+            return (node.type, node.start_pos,
+                    [self.dump(child) for child in node.children])
+        return (node.type, node.start_pos, node.value, node.prefix)
+
+    def test_tokens_are_not_tokenized_again(self):
+        calls = []
+
+        def tokenizer(*args, **kwargs):
+            calls.append(kwargs.get("first_line"))
+            return GRAMMAR._tokenizer(*args, **kwargs)
+
+        lines = split_lines(CODE, keepends=True)
+        module = GRAMMAR.parse(CODE)
+        incremental_tokenizer = IncrementalTokenizer(VERSION, lines)
+        for old, new in (("if a:", "if a and b:"),
+                         ("        # comment\n", "        x = 1\n"),
+                         ("\tpass", "\tpass\n\tpass")):
+            code = CODE.replace(old, new)
+            new_lines = split_lines(code, keepends=True)
+            incremental_tokenizer.update(new_lines)
+            module = DiffParser(
+                GRAMMAR._pgen_grammar, tokenizer, module,
+                incremental_tokenizer
+            ).update(lines, new_lines)
+            self.assertEqual(self.dump(module), self.dump(GRAMMAR.parse(code)))
+            lines = new_lines
+        self.assertEqual(calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
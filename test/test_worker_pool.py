@@ -0,0 +1,174 @@
+"""
+Tests of the worker pool of python_utils.py, talking to it through stdin and
+stdout like Brackets does. Run with ``python -m unittest discover test``.
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+PYTHON_UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, "pythonfiles", "python_utils.py")
+TIMEOUT = 30    # seconds, a hung pool fails the test instead of hanging it
+
+
+class Shell(object):
+    """
+    python_utils.py process with framed messages sent to its stdin and read
+    from its stdout in a thread, so that reads can time out.
+    """
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", PYTHON_UTILS],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=os.path.dirname(PYTHON_UTILS))
+        self.messages = Queue()
+        reader = threading.Thread(target=self._read)
+        reader.daemon = True
+        reader.start()
+
+    def _read(self):
+        while True:
+            header = self.process.stdout.readline()
+            if not header:
+                break
+            encoding, length = header.split()
+            payload = self.process.stdout.read(int(length))
+            self.messages.put(json.loads(payload.decode("utf-8")))
+
+    def send(self, message):
+        payload = json.dumps(message).encode("utf-8")
+        self.process.stdin.write(
+            b"json " + str(len(payload)).encode("ascii") + b"\n" + payload)
+        self.process.stdin.flush()
+
+    def response(self, request_id):
+        """
+        Returns response to a request, skipping events and other responses.
+        """
+        while True:
+            try:
+                message = self.messages.get(timeout=TIMEOUT)
+            except Empty:
+                raise AssertionError("no response to request %s" % request_id)
+            if message.get("id") == request_id:
+                return message
+
+    def request(self, request_id, message):
+        self.send(dict(message, id=request_id))
+        return self.response(request_id)
+
+    def close(self):
+        self.process.stdin.close()
+        try:
+            self.process.wait()
+        finally:
+            self.process.stdout.close()
+
+
+def setup_request(workers):
+    return {"type": "setup",
+            "settings": {"is_case_sensitive": True, "workers": workers}}
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.shell = Shell()
+
+    def tearDown(self):
+        self.shell.close()
+
+    def test_resize(self):
+        response = self.shell.request(1, setup_request(4))
+        self.assertEqual(response["status"], "OK")
+        stats = self.shell.request(2, {"type": "stats"})
+        self.assertEqual(len(stats["content"]["workers"]), 4)
+
+        response = self.shell.request(3, setup_request(1))
+        self.assertEqual(response["status"], "OK")
+        stats = self.shell.request(4, {"type": "stats"})
+        self.assertEqual(len(stats["content"]["workers"]), 1)
+
+    def test_stats(self):
+        self.shell.request(1, setup_request(1))
+        stats = self.shell.request(2, {"type": "stats"})
+        # Stats don't set up an evaluator, that nothing has needed yet.
+        self.assertNotIn("modules", stats["content"]["workers"][0])
+        self.shell.request(3, {
+            "type": "autocomplete",
+            "path": "test.py",
+            "source": "import os\nos.pa",
+            "line": 1,
+            "column": 5
+        })
+        stats = self.shell.request(4, {"type": "stats"})
+        self.assertGreater(stats["content"]["workers"][0]["modules"], 0)
+
+    def test_respawn(self):
+        self.shell.request(1, setup_request(2))
+        stats = self.shell.request(2, {"type": "stats"})
+        killed = stats["content"]["workers"][0]["pid"]
+        os.kill(killed, signal.SIGKILL)
+        time.sleep(1)   # for the pool to notice
+
+        # The pool has been reading stdin, while it has replaced the worker.
+        stats = self.shell.request(3, {"type": "stats"})
+        pids = [worker["pid"] for worker in stats["content"]["workers"]]
+        self.assertEqual(len(pids), 2)
+        self.assertNotIn(killed, pids)
+        response = self.shell.request(4, {
+            "type": "autocomplete",
+            "path": "test.py",
+            "source": "import os\nos.pa",
+            "line": 1,
+            "column": 5
+        })
+        self.assertEqual(response["status"], "OK")
+
+    def test_busy_worker(self):
+        self.shell.request(1, setup_request(2))
+        # Completing in a long source keeps one of the workers busy.
+        self.shell.send({
+            "id": 2,
+            "type": "autocomplete",
+            "path": "slow.py",
+            "source": "x = 1\n" * 20000 + "x.",
+            "line": 20000,
+            "column": 2
+        })
+        time.sleep(0.5)
+        # Document bigger than the buffer of a pipe goes to both workers.
+        self.shell.send({
+            "type": "open",
+            "path": "big.py",
+            "source": "y = 1\n" * 50000,
+            "version": 0
+        })
+        self.shell.send({
+            "id": 3,
+            "type": "autocomplete",
+            "path": "test.py",
+            "source": "import os\nos.pa",
+            "line": 1,
+            "column": 5
+        })
+        # The idle worker responds first, while the busy one hasn't read
+        # the document yet.
+        message = {}
+        while message.get("id") not in (2, 3):
+            message = self.shell.messages.get(timeout=TIMEOUT)
+        self.assertEqual(message["id"], 3)
+        self.assertEqual(self.shell.response(2)["status"], "OK")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the memory parso's trees take: parses a corpus of Python
+modules, keeping the trees, and reports bytes allocated per source line,
+for normal and compact trees.
+
+    python tools/bench_memory.py [--files N] [path ...]
+
+Paths are files or directories, the top level modules of the standard
+library by default. Allocations are traced with tracemalloc, which needs
+Python 3.4 or newer.
+"""
+import argparse
+import gc
+import sys
+import time
+
+from corpus import DEFAULT_PATHS, read_corpus
+import parso
+from parso.utils import split_lines
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def measure(grammar, corpus, options):
+    """
+    Returns bytes allocated by the trees of the corpus and seconds it took
+    to parse them.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    trees = [grammar.parse(code, **options) for code in corpus]
+    seconds = time.time() - start
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del trees
+    return allocated, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--files", type=int, default=60,
+                        help="maximum number of files")
+    args = parser.parse_args()
+    if tracemalloc is None:
+        sys.exit("tracemalloc is not available, use Python 3.4 or newer.")
+
+    grammar = parso.load_grammar()
+    corpus = [code for _, code in read_corpus(args.paths, args.files)]
+    lines = sum(len(split_lines(code)) for code in corpus)
+    print("%d files, %d lines" % (len(corpus), lines))
+    # Grammar and tokenizer set up their caches on the first parse.
+    grammar.parse(corpus[0])
+    for name, options in (("normal", {}), ("compact", {"compact": True})):
+        allocated, seconds = measure(grammar, corpus, options)
+        print("%-8s %6.0f bytes/line %8.1f MB %6.2f s" % (
+            name, allocated / float(lines), allocated / 1e6, seconds))
+
+
+if __name__ == "__main__":
+    main()
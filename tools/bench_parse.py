@@ -0,0 +1,65 @@
+"""
+Benchmark of parso's parse throughput: tokenizes and parses a corpus of
+Python modules and reports tokens and megabytes of source per second.
+
+    python tools/bench_parse.py [--repeat N] [--compact] [path ...]
+
+Paths are files or directories, the top level modules of the standard
+library by default. Parsing includes tokenizing and building the tree.
+Times are the best of the repeated runs.
+"""
+import argparse
+import time
+
+from corpus import DEFAULT_PATHS, read_corpus
+import parso
+from parso.utils import split_lines
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compact", action="store_true",
+                        help="parse into compact trees")
+    args = parser.parse_args()
+
+    grammar = parso.load_grammar()
+    corpus = read_corpus(args.paths)
+    lines = [split_lines(code, keepends=True) for _, code in corpus]
+    megabytes = sum(size for size, _ in corpus) / 1e6
+    tokens = sum(len(list(grammar._tokenize_lines(file_lines, (1, 0))))
+                 for file_lines in lines)
+    print("%d files, %d lines, %.2f MB, %d tokens" % (
+        len(corpus), sum(len(file_lines) for file_lines in lines),
+        megabytes, tokens))
+
+    def tokenize():
+        for file_lines in lines:
+            for _ in grammar._tokenize_lines(file_lines, (1, 0)):
+                pass
+
+    # Without the option, older versions of parso are measured as well.
+    options = {"compact": True} if args.compact else {}
+
+    def parse():
+        for _, code in corpus:
+            grammar.parse(code, **options)
+
+    for name, function in (("tokenize", tokenize), ("parse", parse)):
+        seconds = best_time(function, args.repeat)
+        print("%-8s %6.2f s %10.0f tokens/s %6.2f MB/s" % (
+            name, seconds, tokens / seconds, megabytes / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Set up shared by the scripts in this directory: puts the bundled parso first
+in the module path and reads the Python files they run on. Import this
+before parso.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "pythonfiles"))
+
+from parso import python_bytes_to_unicode # noqa
+
+# The standard library, if no paths are given.
+DEFAULT_PATHS = [os.path.dirname(os.__file__)]
+
+
+def list_files(paths, recursive=False):
+    """
+    Yields the files given and Python files in the directories given, only
+    the top level ones, unless ``recursive`` is set.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+        elif recursive:
+            for directory, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    if file_name.endswith(".py"):
+                        yield os.path.join(directory, file_name)
+        else:
+            for file_name in sorted(os.listdir(path)):
+                if file_name.endswith(".py"):
+                    yield os.path.join(path, file_name)
+
+
+def read_corpus(paths, limit=None):
+    """
+    Returns (source size in bytes, code) of up to ``limit`` files, that can
+    be decoded.
+    """
+    corpus = []
+    for path in list_files(paths):
+        if len(corpus) == limit:
+            break
+        with open(path, "rb") as f:
+            source = f.read()
+        try:
+            corpus.append((len(source), python_bytes_to_unicode(source)))
+        except (LookupError, UnicodeDecodeError):
+            pass
+    return corpus
@@ -0,0 +1,157 @@
+"""
+Differential test of parso's diff parser: applies random edits to Python
+files, updates the tree with the diff parser and compares it with a fresh
+parse of the same code. The code before and after mismatching edits is
+saved, so that they can be reproduced.
+
+    python tools/diff_parser_fuzz.py [--seed N] [--edits N] [--difflib] [path]
+
+Paths are files or directories, the standard library by default. Changed
+line ranges are passed to the diff parser, as an editor does, unless
+``--difflib`` is given. Exits with status 1, if there were mismatches.
+
+The diff parser doesn't always build the same tree, as a fresh parse does,
+for code with syntax errors, so compare the numbers of mismatches before
+and after changing it.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+
+from corpus import DEFAULT_PATHS, list_files
+import parso
+from parso.cache import parser_cache
+from parso.utils import split_lines
+
+SNIPPETS = [
+    "x", "(", ")", "[", "]", ":", " ", "    ", "\n", "\n\n", "\\\n", "#",
+    '"', "'", '"""', "'''", "def f(", "def f():\n    pass\n", "class C:\n",
+    "if x:\n", "else:\n", "return\n", "import os\n", "\t", "@",
+]
+
+
+def dump(node):
+    """
+    Returns comparable structure of a tree with positions and prefixes.
+    """
+    if hasattr(node, "children"):
+        return (node.type, node.start_pos, node.end_pos,
+                tuple(dump(child) for child in node.children))
+    return (node.type, node.start_pos, node.value, node.prefix)
+
+
+def random_edit(code, rnd, lines):
+    """
+    Returns edited code, replacing characters at a random position with a
+    snippet, a piece of the code or nothing.
+    """
+    start = rnd.randrange(len(code) + 1)
+    end = min(len(code), start + rnd.choice([0, 0, 1, 5, 40, 200]))
+    kind = rnd.random()
+    if kind < 0.4:
+        text = rnd.choice(SNIPPETS)
+    elif kind < 0.7:
+        text = "".join(rnd.choice(lines) for _ in range(rnd.randint(1, 3)))
+    else:
+        text = ""
+    return code[:start] + text + code[end:]
+
+
+def changed_range(old_lines, new_lines):
+    """
+    Returns ``(old_start, old_end, new_start, new_end)`` range of the
+    changed lines, as an editor would tell.
+    """
+    start = 0
+    length = min(len(old_lines), len(new_lines))
+    while start < length and old_lines[start] == new_lines[start]:
+        start += 1
+    end = 0
+    while end < length - start and old_lines[-1 - end] == new_lines[-1 - end]:
+        end += 1
+    return start, len(old_lines) - end, start, len(new_lines) - end
+
+
+def check_file(grammar, path, rnd, edits, use_difflib):
+    """
+    Yields (old code, new code, problem) of mismatching edits. The tree is
+    parsed again after those, so that the next edits are checked alone.
+    """
+    with io.open(path, encoding="utf-8", errors="replace") as f:
+        code = f.read()
+    if not code:
+        return
+    parser_cache.clear()
+    grammar.parse(code, path=path, diff_cache=True)
+    lines = split_lines(code, keepends=True)
+    for _ in range(edits):
+        new_code = random_edit(code, rnd, lines)
+        new_lines = split_lines(new_code, keepends=True)
+        kwargs = {}
+        if not use_difflib:
+            kwargs["changed_ranges"] = [changed_range(
+                split_lines(code, keepends=True), new_lines)]
+        problem = None
+        try:
+            module = grammar.parse(new_code, path=path, diff_cache=True,
+                                   **kwargs)
+        except Exception as e:
+            problem = "%s raised" % type(e).__name__
+        else:
+            if module.get_code() != new_code:
+                problem = "code differs"
+            elif dump(module) != dump(grammar.parse(new_code)):
+                problem = "tree differs"
+        if problem is not None:
+            yield code, new_code, problem
+            parser_cache.clear()
+            grammar.parse(new_code, path=path, diff_cache=True)
+        code = new_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--edits", type=int, default=20,
+                        help="edits per file")
+    parser.add_argument("--files", type=int, default=100,
+                        help="maximum number of files")
+    parser.add_argument("--difflib", action="store_true",
+                        help="let the diff parser diff lines")
+    parser.add_argument("--output", default=os.path.join(
+                            tempfile.gettempdir(), "diff-parser-mismatches"),
+                        help="directory for code of mismatches")
+    args = parser.parse_args()
+
+    grammar = parso.load_grammar()
+    rnd = random.Random(args.seed)
+    checked = 0
+    problems = {}
+    for path in list_files(args.paths, recursive=True):
+        if checked == args.files:
+            break
+        checked += 1
+        for old_code, new_code, problem in check_file(
+                grammar, path, rnd, args.edits, args.difflib):
+            problems[problem] = problems.get(problem, 0) + 1
+            if not os.path.isdir(args.output):
+                os.makedirs(args.output)
+            name = os.path.join(args.output, "%d-%s" % (
+                sum(problems.values()), os.path.basename(path)))
+            for suffix, code in ((".old", old_code), (".new", new_code)):
+                with io.open(name + suffix, "w", encoding="utf-8") as f:
+                    f.write(code)
+            print("%s: %s, see %s.old and .new" % (path, problem, name))
+    print("%d files, %d edits each, %d mismatches"
+          % (checked, args.edits, sum(problems.values())))
+    for problem, count in sorted(problems.items()):
+        print("  %s: %d" % (problem, count))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())